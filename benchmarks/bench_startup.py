@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+#
+#  Copyright (C) 2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""startup benchmark for the micromon scripts
+
+Each case is the import line a script starts with.  It is run in a fresh
+interpreter with -X importtime to get the import time of the package
+and the list of modules it pulled in, and timed as a whole process
+against an empty interpreter.  The run fails when a case loads a module
+that must stay lazy or adds more than --max-ms to the startup.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from os import path
+from time import perf_counter
+
+ROOT = path.normpath(path.join(path.dirname(__file__), '..'))
+
+CASES = {
+    'ram_boot.py': 'from micromon import *',
+    'micromon.py': 'from micromon import *\n'
+                   'from micromon.registers import Registers',
+}
+
+# modules only needed once a board is actually talked to
+LAZY = ['serial', 'subprocess', 'hashlib', 'json', 'configparser',
+        'micromon.regtable', 'micromon.journal']
+
+def run(code, *options):
+    return subprocess.run([sys.executable] + list(options) + ['-c', code],
+                          cwd=ROOT, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+
+def import_time(code):
+    """cumulative import time of the micromon modules in microseconds"""
+    result = run(code, '-X', 'importtime')
+    total = 0
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        # only count top level imports made by the case itself
+        if name.strip().startswith('micromon') and \
+                len(name) - len(name.lstrip()) == 1:
+            total += int(fields[1])
+    return total
+
+def loaded_modules(code):
+    result = run(code + '\nimport sys\nprint("\\n".join(sys.modules))')
+    return set(result.stdout.split())
+
+def wall_time(code, repeat):
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        run(code)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='process launches per case, the best is kept')
+    parser.add_argument('--max-ms', type=float, default=30.0,
+                        help='fail when a case adds more than this to the '
+                             'interpreter startup')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    baseline = wall_time('pass', args.repeat)
+    results = {'benchmark': 'startup', 'python': sys.version.split()[0],
+               'interpreter_ms': baseline * 1000.0, 'cases': {}}
+    failed = False
+
+    print('%-14s %12s %12s  %s' % ('case', 'import ms', 'added ms', 'eager'))
+    for name, code in CASES.items():
+        imports = import_time(code) / 1000.0
+        added = (wall_time(code, args.repeat) - baseline) * 1000.0
+        eager = sorted(loaded_modules(code) & set(LAZY))
+        results['cases'][name] = {'import_ms': imports, 'added_ms': added,
+                                  'eager': eager}
+        print('%-14s %12.1f %12.1f  %s' % (name, imports, added,
+                                           ', '.join(eager) or '-'))
+        if eager or added > args.max_ms:
+            failed = True
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+        print('Results written to %s' % args.output)
+
+    if failed:
+        print('Startup regression, see the cases above')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+#
+#  Copyright (C) 2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""transport benchmarks against a board or the emulator
+
+For every baudrate the target is booted through Loader, then bulk
+mem_write/mem_read throughput is measured across transfer and block
+sizes, and round trip latency is sampled for each opcode that answers.
+Results are written as JSON; pass --baseline with an earlier result file
+to print the relative change of every metric.
+
+Booting at several baudrates on a real board needs a reset pin, the
+emulator is simply restarted.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from os import path
+from time import perf_counter, strftime
+
+sys.path.insert(0, path.normpath(path.join(path.dirname(__file__), '..')))
+
+import micromon
+from micromon import Core, Loader, Target
+from micromon.core import SCRATCH_ADDR, SCRATCH_SIZE
+from micromon.config import Config
+from micromon.emulator import Emulator
+from micromon.loader import BAUDRATES
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+def summarize(samples):
+    """latency statistics in microseconds with a log2 histogram"""
+    us = [s * 1e6 for s in samples]
+    histogram = {}
+    for s in us:
+        bucket = 1 << max(0, int(s)).bit_length()
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    return {
+        'count': len(us),
+        'mean_us': sum(us) / len(us),
+        'p50_us': percentile(us, 50),
+        'p90_us': percentile(us, 90),
+        'p99_us': percentile(us, 99),
+        'max_us': max(us),
+        'histogram_us': {str(k): v for k, v in sorted(histogram.items())},
+    }
+
+def boot(args, baudrate):
+    Config.set('monitor.baudrate', baudrate)
+    if args.emulator:
+        emulator = Emulator(args.boot_size, not args.no_throttle,
+                            args.latency)
+        port = emulator.open_pty()
+    else:
+        port = args.port
+    start = perf_counter()
+    target = Target(port)
+    Loader(target)
+    core = Core(target)
+    return target, core, perf_counter() - start
+
+def bench_latency(core, samples):
+    addr = SCRATCH_ADDR
+    word = os.urandom(4)
+    ops = {
+        'read_u8': lambda: core.read_u8(addr),
+        'read_u16': lambda: core.read_u16(addr),
+        'read_u32': lambda: core.read_u32(addr),
+        # writes are not acknowledged, a read is used to wait for them
+        'write_u8': lambda: (core.write_u8(addr, 0x5A), core.read_u8(addr)),
+        'write_u16': lambda: (core.write_u16(addr, 0x5AA5),
+                              core.read_u8(addr)),
+        'write_u32': lambda: (core.write_u32(addr, 0x5AA5A55A),
+                              core.read_u8(addr)),
+        'mem_write': lambda: core.mem_write(addr, word, compress=False),
+        'mem_read': lambda: core.mem_read(addr, 4),
+        'mem_write_lz': lambda: core.mem_write(addr, bytes(64),
+                                               compress=True),
+        'mem_crc': lambda: core.mem_crc(addr, 4),
+    }
+    results = {}
+    for name, op in ops.items():
+        times = []
+        for _ in range(samples):
+            start = perf_counter()
+            op()
+            times.append(perf_counter() - start)
+        results[name] = summarize(times)
+    return results
+
+def bench_bulk(target, core, sizes, block_sizes, repeat):
+    results = []
+    for size in sizes:
+        data = os.urandom(size)
+        for block_size in block_sizes:
+            # writes are split up by the target, reads by the core
+            target.set_block_size(block_size)
+            core.block_size = block_size
+            for name, op in (
+                    ('mem_write', lambda: core.mem_write(SCRATCH_ADDR, data,
+                                                         compress=False)),
+                    ('mem_read', lambda: core.mem_read(SCRATCH_ADDR, size)[1])):
+                best = None
+                for _ in range(repeat):
+                    start = perf_counter()
+                    ok = op()
+                    elapsed = perf_counter() - start
+                    if not ok:
+                        raise Exception('%s of %d bytes failed' % (name, size))
+                    best = elapsed if best is None else min(best, elapsed)
+                results.append({'op': name, 'size': size,
+                                'block_size': block_size, 'seconds': best,
+                                'bytes_per_s': size / best})
+    core.block_size = Core.block_size
+    return results
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=micromon.MICROMON_ROOT, stderr=subprocess.DEVNULL,
+            universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results):
+    """metric name -> value, for comparing two result files"""
+    metrics = {}
+    for baudrate, r in results['baudrates'].items():
+        metrics['%s boot_s' % baudrate] = r['boot_s']
+        for name, stats in r['latency'].items():
+            metrics['%s %s p50_us' % (baudrate, name)] = stats['p50_us']
+            metrics['%s %s p99_us' % (baudrate, name)] = stats['p99_us']
+        for b in r['bulk']:
+            key = '%s %s size=%d block=%d bytes_per_s' % (
+                baudrate, b['op'], b['size'], b['block_size'])
+            metrics[key] = b['bytes_per_s']
+    return metrics
+
+def compare(baseline, results):
+    old = flatten(baseline)
+    new = flatten(results)
+    for key in sorted(set(old) & set(new)):
+        if old[key]:
+            change = (new[key] - old[key]) / old[key] * 100.0
+            print('%-60s %12.1f %12.1f %+7.1f%%' % (key, old[key], new[key],
+                                                    change))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emulator', action='store_true',
+                        help='benchmark a local emulated target')
+    parser.add_argument('--port', help='serial port of a real board')
+    parser.add_argument('--boot-size', choices=['512', '16k'], default='512')
+    parser.add_argument('--no-throttle', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='emulated response latency in seconds')
+    parser.add_argument('--baudrate', action='append',
+                        choices=['auto'] + [str(b) for b in sorted(BAUDRATES)],
+                        help='may be repeated, defaults to the configured one')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[4096, 16384, SCRATCH_SIZE],
+                        help='bulk transfer sizes, at most %d bytes so they '
+                             'stay in the scratch area' % SCRATCH_SIZE)
+    parser.add_argument('--block-sizes', type=int, nargs='+',
+                        default=[128, 512, 4096])
+    parser.add_argument('--samples', type=int, default=200,
+                        help='latency samples per opcode')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='bulk runs per point, the best is kept')
+    parser.add_argument('--output', default='bench_transport.json')
+    parser.add_argument('--baseline', help='earlier result file to compare')
+    args = parser.parse_args()
+    if max(args.sizes) > SCRATCH_SIZE:
+        parser.error('sizes may be at most %d bytes' % SCRATCH_SIZE)
+
+    baudrates = args.baudrate or [Config.get('monitor.baudrate')]
+    results = {
+        'benchmark': 'transport',
+        'revision': revision(),
+        'date': strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'target': 'emulator' if args.emulator else (
+            args.port or Config.get('target.serial_port')),
+        'baudrates': {},
+    }
+
+    for baudrate in baudrates:
+        print('Benchmarking at %s baud' % baudrate)
+        target, core, boot_time = boot(args, baudrate)
+        results['baudrates'][str(baudrate)] = {
+            'boot_s': boot_time,
+            'latency': bench_latency(core, args.samples),
+            'bulk': bench_bulk(target, core, args.sizes, args.block_sizes,
+                               args.repeat),
+        }
+        target.close()
+
+    with open(args.output, 'w') as fp:
+        json.dump(results, fp, indent=2)
+    print('Results written to %s' % args.output)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            compare(json.load(fp), results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+#
+#  Copyright (C) 2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import argparse
+from time import sleep
+from micromon.emulator import Emulator
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve an emulated micromon target on a pty.')
+    parser.add_argument('--boot-size', choices=['512', '16k'], default='512',
+                        help='boot ROM UART boot mode')
+    parser.add_argument('--no-throttle', action='store_true',
+                        help='do not limit the byte rate to the baudrate')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added before each response')
+    args = parser.parse_args()
+
+    emulator = Emulator(args.boot_size, not args.no_throttle, args.latency)
+    path = emulator.open_pty()
+    print(f'Emulated target on {path}, set it as the target serial port')
+    while True:
+        sleep(1)
+
+if __name__ == '__main__':
+    main()
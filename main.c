@@ -33,6 +33,14 @@ static void read_u16();
 static void read_u32();
 static void run(u32 exec_at);
 static void run_kernel(u32 exec_at, u32 machine_type);
+static void mem_write_lz(void);
+static void mem_crc(void);
+static void mem_write_blocks(void);
+static void mem_read_blocks(void);
+static void mem_poll(void);
+static void adc_capture(void);
+static void mem_fill(void);
+static void rmw(void);
 
 enum cmd_commands {
 	cmd_nop = 0,
@@ -46,9 +54,39 @@ enum cmd_commands {
 	cmd_mem_read,
 	cmd_run,
 	cmd_run_kernel,
+	cmd_mem_write_lz,
+	cmd_mem_crc,
+	cmd_mem_write_blocks,
+	cmd_mem_read_blocks,
+	cmd_mem_poll,
+	cmd_adc_capture,
+	cmd_mem_fill,
+	cmd_rmw,
 	END_OF_COMMANDS
 };
 
+#define BLOCK_SYNC	0x4b4c4275 /* uBLK */
+#define BLOCK_START	0xfffffffe
+#define BLOCK_END	0xffffffff
+#define BLOCK_ACK	0x06
+#define BLOCK_NAK	0x15
+#define MAX_BLOCK_SIZE	4096
+
+/*
+ * mem_poll has no timer to go by, its timeout is counted in loop
+ * iterations.  This is a rough figure for a register read on the APB at
+ * 533 MHz, so the timeout is only approximate.
+ */
+#define POLL_LOOPS_PER_US	8
+
+#define ADCCON		(*(volatile u16 *)0xC0005000)
+#define ADCDAT		(*(volatile u16 *)0xC0005004)
+#define ADCCON_ADEN	(1 << 0)
+#define ADCCON_ASEL(n)	((n) << 3)
+#define ADC_TIMEOUT_LOOPS	100000
+
+static u8 block_buf[MAX_BLOCK_SIZE];
+
 int main(void)
 {
 	init_crc32_table();
@@ -101,6 +139,38 @@ int main(void)
 		case cmd_run_kernel:
 			run_kernel(uart0_readl(), uart0_readl());
 			break;
+
+		case cmd_mem_write_lz:
+			mem_write_lz();
+			break;
+
+		case cmd_mem_crc:
+			mem_crc();
+			break;
+
+		case cmd_mem_write_blocks:
+			mem_write_blocks();
+			break;
+
+		case cmd_mem_read_blocks:
+			mem_read_blocks();
+			break;
+
+		case cmd_mem_poll:
+			mem_poll();
+			break;
+
+		case cmd_adc_capture:
+			adc_capture();
+			break;
+
+		case cmd_mem_fill:
+			mem_fill();
+			break;
+
+		case cmd_rmw:
+			rmw();
+			break;
 		}
 	}
 
@@ -179,6 +249,366 @@ static void mem_read(void)
 	uart0_writel(crc);
 }
 
+static void mem_crc(void)
+{
+	u8 *addr, *p, *end, *block_end;
+	u32 size, block_size;
+	u32 crc;
+
+	addr = (u8 *)uart0_readl();
+	size = uart0_readl();
+	block_size = uart0_readl();
+	if (!block_size)
+		block_size = size;
+
+	p = addr;
+	end = addr + size;
+	while (end > p) {
+		crc = 0;
+		block_end = p + block_size;
+		if (block_end > end || block_end < p)
+			block_end = end;
+		while (block_end > p) {
+			crc = crc32(crc, *p);
+			p++;
+		}
+		uart0_writel(crc);
+	}
+}
+
+static u32 crc32_l(u32 crc, u32 value)
+{
+	u32 i;
+
+	for (i = 0; i < 4; i++)
+		crc = crc32(crc, value >> (i * 8));
+	return crc;
+}
+
+/*
+ * Status frames carry a crc over the status and sequence number, a
+ * damaged one must not pass for the acknowledgement of another block.
+ */
+static void block_status(u8 status, u32 seq)
+{
+	uart0_writeb(status);
+	uart0_writel(seq);
+	uart0_writel(crc32_l(crc32(0, status), seq));
+}
+
+/*
+ * mem_write_blocks and mem_read_blocks start with address, size and block
+ * size followed by their crc, answered with an ACK or NAK of BLOCK_START.
+ * Returns whether the header checked out.
+ */
+static int blocks_header(u8 **addr, u32 *size, u32 *block_size)
+{
+	u32 crc;
+
+	*addr = (u8 *)uart0_readl();
+	*size = uart0_readl();
+	*block_size = uart0_readl();
+	crc = crc32_l(crc32_l(crc32_l(0, (u32)*addr), *size), *block_size);
+	if (uart0_readl() != crc || !*block_size ||
+			*block_size > MAX_BLOCK_SIZE) {
+		block_status(BLOCK_NAK, BLOCK_START);
+		return 0;
+	}
+	block_status(BLOCK_ACK, BLOCK_START);
+	return 1;
+}
+
+/*
+ * Each block arrives as sync, sequence number, payload and a crc over the
+ * sequence number and payload.  Blocks are staged in block_buf and only
+ * copied to their destination once the crc checks out, so a damaged
+ * sequence number can not scribble over a block that was already
+ * acknowledged.  The host resends whatever is not acknowledged and
+ * finishes with a BLOCK_END frame.
+ */
+static void mem_write_blocks(void)
+{
+	u8 *addr, *p;
+	u32 size, block_size, seq, len, crc, sync, i;
+	u8 b;
+
+	if (!blocks_header(&addr, &size, &block_size))
+		return;
+
+	while (1) {
+		sync = 0;
+		while (sync != BLOCK_SYNC)
+			sync = (sync >> 8) | (uart0_readb() << 24);
+
+		crc = 0;
+		seq = 0;
+		for (i = 0; i < 4; i++) {
+			b = uart0_readb();
+			crc = crc32(crc, b);
+			seq |= b << (i * 8);
+		}
+
+		if (seq == BLOCK_END) {
+			len = 0;
+		} else if (seq >= 0x100000 || seq * block_size >= size) {
+			block_status(BLOCK_NAK, seq);
+			continue;
+		} else {
+			len = size - seq * block_size;
+			if (len > block_size)
+				len = block_size;
+		}
+
+		for (i = 0; i < len; i++) {
+			block_buf[i] = uart0_readb();
+			crc = crc32(crc, block_buf[i]);
+		}
+		if (uart0_readl() != crc) {
+			block_status(BLOCK_NAK, seq);
+			continue;
+		}
+
+		if (seq == BLOCK_END) {
+			block_status(BLOCK_ACK, seq);
+			return;
+		}
+
+		p = addr + seq * block_size;
+		for (i = 0; i < len; i++)
+			p[i] = block_buf[i];
+		block_status(BLOCK_ACK, seq);
+	}
+}
+
+static void mem_read_blocks(void)
+{
+	u8 *addr, *p, *end, *block_end;
+	u32 size, block_size;
+	u32 crc;
+
+	if (!blocks_header(&addr, &size, &block_size))
+		return;
+
+	p = addr;
+	end = addr + size;
+	while (end > p) {
+		crc = 0;
+		block_end = p + block_size;
+		if (block_end > end || block_end < p)
+			block_end = end;
+		while (block_end > p) {
+			uart0_writeb(*p);
+			crc = crc32(crc, *p);
+			p++;
+		}
+		uart0_writel(crc);
+	}
+}
+
+/*
+ * Fill size bytes at addr with an 8, 16 or 32 bit pattern that starts at
+ * addr, whatever its alignment, and answer with the crc of the result.
+ */
+static void mem_fill(void)
+{
+	u8 *addr, *p, *end;
+	u32 size, pattern, fill;
+	u32 crc = 0;
+	u8 width;
+
+	addr = (u8 *)uart0_readl();
+	size = uart0_readl();
+	pattern = uart0_readl();
+	width = uart0_readb();
+
+	if (width == 8)
+		fill = (pattern & 0xff) * 0x01010101;
+	else if (width == 16)
+		fill = (pattern & 0xffff) * 0x00010001;
+	else
+		fill = pattern;
+
+	/* bytes up to a word boundary, rotating the pattern along */
+	p = addr;
+	end = addr + size;
+	while (end > p && ((u32)p & 3)) {
+		*p++ = fill;
+		fill = (fill >> 8) | (fill << 24);
+	}
+	while (end - p >= 4) {
+		*(u32 *)p = fill;
+		p += 4;
+	}
+	while (end > p) {
+		*p++ = fill;
+		fill = (fill >> 8) | (fill << 24);
+	}
+
+	for (p = addr; end > p; p++)
+		crc = crc32(crc, *p);
+	uart0_writel(crc);
+}
+
+/*
+ * Replace the width bit value at addr with ((value & and) | or) ^ xor,
+ * without an answer, so a bit operation costs one message.
+ */
+static void rmw(void)
+{
+	u32 addr, and_mask, or_mask, xor_mask;
+	u8 width;
+
+	addr = uart0_readl();
+	width = uart0_readb();
+	and_mask = uart0_readl();
+	or_mask = uart0_readl();
+	xor_mask = uart0_readl();
+
+	if (width == 8)
+		*(volatile u8 *)addr = ((*(volatile u8 *)addr & and_mask) |
+				or_mask) ^ xor_mask;
+	else if (width == 16)
+		*(volatile u16 *)addr = ((*(volatile u16 *)addr & and_mask) |
+				or_mask) ^ xor_mask;
+	else
+		*(volatile u32 *)addr = ((*(volatile u32 *)addr & and_mask) |
+				or_mask) ^ xor_mask;
+}
+
+/*
+ * Read addr until the bits in mask equal value or the timeout runs out,
+ * then answer with the last value read and the number of reads.
+ */
+static void mem_poll(void)
+{
+	u32 addr, mask, value, timeout, limit, n, i;
+	u8 width;
+
+	addr = uart0_readl();
+	width = uart0_readb();
+	mask = uart0_readl();
+	value = uart0_readl();
+	timeout = uart0_readl();
+
+	if (timeout > 0xffffffff / POLL_LOOPS_PER_US)
+		limit = 0xffffffff;
+	else
+		limit = timeout * POLL_LOOPS_PER_US;
+
+	i = 0;
+	do {
+		if (width == 8)
+			n = *(volatile u8 *)addr;
+		else if (width == 16)
+			n = *(volatile u16 *)addr;
+		else
+			n = *(volatile u32 *)addr;
+		i++;
+	} while ((n & mask) != value && i < limit);
+
+	uart0_writel(n);
+	uart0_writel(i);
+}
+
+/*
+ * Convert each channel in the channel mask in turn, rounds times, storing
+ * the 10 bit results as u16 at addr.  The host has set up the ADC clock
+ * and prescaler.  A conversion that never finishes ends the capture early,
+ * the answer is the number of samples stored.
+ */
+static void adc_capture(void)
+{
+	u16 *addr, con;
+	u32 rounds, round, count, wait;
+	u8 channels, channel;
+
+	addr = (u16 *)uart0_readl();
+	channels = uart0_readb();
+	rounds = uart0_readl();
+
+	con = ADCCON & ~(ADCCON_ASEL(7) | ADCCON_ADEN);
+	count = 0;
+	for (round = 0; round < rounds; round++) {
+		for (channel = 0; channel < 8; channel++) {
+			if (!(channels & (1 << channel)))
+				continue;
+			ADCCON = con | ADCCON_ASEL(channel) | ADCCON_ADEN;
+			wait = ADC_TIMEOUT_LOOPS;
+			while ((ADCCON & ADCCON_ADEN) && --wait)
+				;
+			if (!wait)
+				goto done;
+			addr[count++] = ADCDAT & 0x3ff;
+		}
+	}
+
+done:
+	uart0_writel(count);
+}
+
+static u32 lz_length(const u8 **src, u32 len)
+{
+	u8 b;
+
+	if (len == 15) {
+		do {
+			b = *(*src)++;
+			len += b;
+		} while (b == 255);
+	}
+	return len;
+}
+
+/*
+ * The LZ4 block stream is received at src, which the host places at the
+ * end of the destination so that it can be decoded in place.
+ */
+static void mem_write_lz(void)
+{
+	u8 *addr, *p, *end, *match;
+	const u8 *src, *src_end;
+	u32 size, packed_size, len;
+	u32 crc = 0;
+	u16 offset;
+	u8 token;
+
+	addr = (u8 *)uart0_readl();
+	size = uart0_readl();
+	p = (u8 *)uart0_readl();
+	packed_size = uart0_readl();
+
+	src = p;
+	src_end = src + packed_size;
+	while (src_end > p)
+		*p++ = uart0_readb();
+
+	p = addr;
+	end = addr + size;
+	while (src_end > src) {
+		token = *src++;
+		len = lz_length(&src, token >> 4);
+		while (len-- && end > p) {
+			*p = *src++;
+			crc = crc32(crc, *p);
+			p++;
+		}
+		if (src >= src_end)
+			break;
+
+		offset = src[0] | (src[1] << 8);
+		src += 2;
+		len = lz_length(&src, token & 15) + 4;
+		match = p - offset;
+		while (len-- && end > p) {
+			*p = *match++;
+			crc = crc32(crc, *p);
+			p++;
+		}
+	}
+	uart0_writel(p - addr);
+	uart0_writel(crc);
+}
+
 static void run(u32 exec_at)
 {
 #if defined(CONFIG_BAREMETAL_DCACHE)
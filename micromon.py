@@ -16,11 +16,16 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 #
 
+import argparse
 from cmd import Cmd
 import sys
 from time import sleep
 from micromon import *
-from micromon.registers import REGS, Registers
+from micromon.adc import Adc
+from micromon.cache import CachedCore, format_cache_stats
+from micromon.core import Future
+from micromon.registers import Registers
+from micromon.stats import format_stats
 
 def print_value(value, bits):
     value_bin = bin(value)[2:].zfill(bits)
@@ -28,25 +33,91 @@ def print_value(value, bits):
     value_hex = ('0x%0.*X' % (bits // 4, value)).rjust(10)
     print('%s      %s' % (value_hex, value_bin.rjust(14 - len(value_bin))))
 
+# commands without a result the script has to wait on, consecutive ones
+# are sent as a single batch
+BATCHABLE = ('readb', 'readw', 'readl', 'writeb', 'writew', 'writel',
+             'power')
+
+# reads queued in one batch at most, keeps the response within the timeout
+MAX_BATCH_READS = 256
+
 class CommandParser(Cmd):
-    def __init__(self):
+    def __init__(self, cache=False):
         Cmd.__init__(self)
         self.prompt = '> '
+        self.cache = cache
         self.target = None
+        self.failed = False
+        self.pending = None
     
     def preloop(self):
         self.target = Target()
         self.loader = Loader(self.target)
         self.core = Core(self.target)
+        if self.cache:
+            self.core = CachedCore(self.core)
+        self.io = self.core
         self.regs = Registers(self.core)
+        self.adc = Adc(self.core)
 
     def emptyline(self):
         pass
 
+    def default(self, line):
+        self.error(f'Unknown syntax: {line}')
+
+    def error(self, message):
+        self.later(lambda: print(f'*** {message}'))
+        self.failed = True
+
+    def later(self, output):
+        """run output now, or once the batch being built is flushed"""
+        if self.pending is None:
+            output()
+        else:
+            self.pending.append(output)
+
+    def begin_batch(self):
+        self.io = self.core.batch()
+        self.pending = []
+
+    def end_batch(self):
+        if self.pending is None:
+            return
+        batch, self.io = self.io, self.core
+        pending, self.pending = self.pending, None
+        batch.flush()
+        for output in pending:
+            output()
+
+    def run_script(self, fp):
+        """run the commands in fp, one per line, # starts a comment.
+        Stops at the first error, returns the exit status."""
+        self.preloop()
+        for line in fp:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.split()[0] in BATCHABLE:
+                if self.pending is None:
+                    self.begin_batch()
+            else:
+                # a read in the flushed batch may have failed
+                self.end_batch()
+                if self.failed:
+                    break
+            stop = self.onecmd(line)
+            if self.pending is not None and len(self.io) >= MAX_BATCH_READS:
+                self.end_batch()
+            if stop or self.failed:
+                break
+        self.end_batch()
+        return 1 if self.failed else 0
+
     def read(self, s, bits):
         l = s.split()
         if len(l) != 1:
-            print('*** Invalid number of arguments')
+            self.error('Invalid number of arguments')
             return
 
         upper = (1 << 32) - 1
@@ -55,30 +126,36 @@ class CommandParser(Cmd):
         except:
             try:
                 r = Registers.lookup(l[0])
-                if r['bits'] != bits:
-                    regbits = r['bits']
-                    print(f'Note: Register is {regbits} bits')
-                addr = r['addr']
+                if r.bits != bits:
+                    self.later(lambda: print(
+                        f'Note: Register is {r.bits} bits'))
+                addr = r.addr
             except:
-                print('*** Register is unknown')
+                self.error('Register is unknown')
                 return
 
         if addr < 0 or addr > upper:
-            print(f'*** Address must be an integer in the range of 0 to {upper}')
+            self.error(f'Address must be an integer in the range of 0 to {upper}')
             return
 
         if bits == 8:
-            value = self.core.read_u8(addr)
+            value = self.io.read_u8(addr)
         elif bits == 16:
-            value = self.core.read_u16(addr)
+            value = self.io.read_u16(addr)
         elif bits == 32:
-            value = self.core.read_u32(addr)
+            value = self.io.read_u32(addr)
         else:
-            print('*** Invalid number of bits')
+            self.error('Invalid number of bits')
             return
 
+        self.later(lambda: self.print_read(value, bits))
+
+    def print_read(self, value, bits):
+        if isinstance(value, Future):
+            value = value.result()
+
         if value is None:    
-            print('*** Error reading')
+            self.error('Error reading')
             return
 
         print_value(value, bits)
@@ -86,7 +163,7 @@ class CommandParser(Cmd):
     def write(self, s, bits):
         l = s.split()
         if len(l) != 2:
-            print('*** Invalid number of arguments')
+            self.error('Invalid number of arguments')
             return
         
         upper = (1 << 32) - 1
@@ -95,16 +172,16 @@ class CommandParser(Cmd):
         except:
             try:
                 r = Registers.lookup(l[0])
-                if r['bits'] != bits:
-                    regbits = r['bits']
-                    print(f'Note: Register is {regbits} bits')
-                addr = r['addr']
+                if r.bits != bits:
+                    self.later(lambda: print(
+                        f'Note: Register is {r.bits} bits'))
+                addr = r.addr
             except:
-                print('*** Register is unknown')
+                self.error('Register is unknown')
                 return
 
         if addr < 0 or addr > upper:
-            print(f'*** Address must be an integer in the range of 0 to {upper}')
+            self.error(f'Address must be an integer in the range of 0 to {upper}')
             return
         
         upper = (1 << bits) - 1
@@ -112,17 +189,17 @@ class CommandParser(Cmd):
             value = int(l[1], 0)
             assert value >= 0 and value <= upper
         except:
-            print(f'*** Value must be an integer in the range of 0 to {upper}')
+            self.error(f'Value must be an integer in the range of 0 to {upper}')
             return
 
         if bits == 8:
-            self.core.write_u8(addr, value)
+            self.io.write_u8(addr, value)
         elif bits == 16:
-            self.core.write_u16(addr, value)
+            self.io.write_u16(addr, value)
         elif bits == 32:
-            self.core.write_u32(addr, value)
+            self.io.write_u32(addr, value)
         else:
-            print('*** Invalid number of bits')
+            self.error('Invalid number of bits')
             return
 
     def do_readb(self, s):
@@ -151,21 +228,58 @@ class CommandParser(Cmd):
 
         Write a u8 value to memory.
         """
-        self.write(self, s, 8)
+        self.write(s, 8)
 
     def do_writew(self, s):
         """writew address value
 
         Write a u16 value to memory.
         """
-        self.write(self, s, 16)
+        self.write(s, 16)
 
     def do_writel(self, s):
         """writel address value
 
         Write a u32 value to memory.
         """
-        self.write(self, s, 32)
+        self.write(s, 32)
+
+    def do_fill(self, s):
+        """fill address size [[pattern]] [[width]]
+
+        Fill size bytes of memory with a repeated 8, 16 or 32 bit pattern,
+        zero and 8 by default.  The target does the filling.
+        """
+        l = s.split()
+        if len(l) < 2 or len(l) > 4:
+            self.error('Invalid number of arguments')
+            return
+
+        upper = (1 << 32) - 1
+        try:
+            addr, size = int(l[0], 0), int(l[1], 0)
+            assert addr >= 0 and size >= 0 and addr + size <= upper + 1
+        except:
+            self.error('Invalid address or size')
+            return
+
+        try:
+            width = int(l[3], 0) if len(l) > 3 else 8
+            assert width in (8, 16, 32)
+        except:
+            self.error('Width must be 8, 16 or 32')
+            return
+
+        upper = (1 << width) - 1
+        try:
+            pattern = int(l[2], 0) if len(l) > 2 else 0
+            assert pattern >= 0 and pattern <= upper
+        except:
+            self.error(f'Pattern must be an integer in the range of 0 to {upper}')
+            return
+
+        if not self.core.mem_fill(addr, size, pattern, width):
+            self.error('Fill crc mismatch')
 
     def do_reglist(self, s):
         """reglist [[group]]
@@ -177,30 +291,22 @@ class CommandParser(Cmd):
         if len(l) == 1:
             group = l[0].upper()
         elif len(l) > 2:
-            print('*** Invalid number of arugments')
+            self.error('Invalid number of arugments')
             return
 
-        groups = []
-        regs = {}
-
-        for r in REGS:
-            r_group = r['group'].upper()
-            if r_group.upper() not in groups:
-                groups.append(r_group)
-                regs[r_group] = []
-            regs[r_group].append(r)
+        groups = Registers.groups()
 
         if group is None:
             print('')
-            self.print_topics('Register groups', groups, 15, 80)
+            self.print_topics('Register groups', list(groups), 15, 80)
         else:
             if group in groups:
                 print('')
-                for r in regs[group]:
-                    print(('0x%08X      %-24s' % (r['addr'], r['name'])))
+                for r in groups[group]:
+                    print(('0x%08X      %-24s' % (r.addr, r.name)))
                 print('')
             else:
-                print('*** Unknown register group')
+                self.error('Unknown register group')
                 return
 
     # TODO:
@@ -214,106 +320,209 @@ class CommandParser(Cmd):
         """memtoggle [addr] [bits] [mask]"""
         l = s.split()
         if len(l) != 3:
-            print('*** Invalid number of arguments')
+            self.error('Invalid number of arguments')
             return
 
         addr = None
         bits = None
-        value = None
         try:
             addr = int(l[0],16)
             bits = int(l[1])
             mask = int(l[2],16)
             assert bits in [8, 16, 32]
         except:
-            print('*** Bad values')
+            self.error('Bad values')
             return
 
-        if bits == 8:
-            read = lambda addr: self.core.read_u8(addr)
-            write = lambda addr, value: self.core.write_u8(addr, value)
-        elif bits == 16:
-            read = lambda addr: self.core.read_u16(addr)
-            write = lambda addr, value: self.core.write_u16(addr, value)
-        elif bits == 32:
-            read = lambda addr: self.core.read_u32(addr)
-            write = lambda addr, value: self.core.write_u32(addr, value)
-
-        orig = read(addr)
-        value = orig
-
-        print('Press any key to stop...')
-        while not getkey():
-            value ^= mask
-            write(addr, value)
-            sleep(0.05)
+        # each toggle is a single rmw, an odd count is undone at the end
+        toggles = 0
+        print('Press Ctrl-C to stop...')
+        try:
+            while True:
+                self.core.rmw(addr, bits, xor_mask=mask)
+                toggles += 1
+                sleep(0.05)
+        except KeyboardInterrupt:
+            pass
 
-        write(addr, orig)
+        if toggles % 2:
+            self.core.rmw(addr, bits, xor_mask=mask)
 
     def do_adc(self, s):
-        """adc [channel]"""
+        """adc channel
+        adc capture channel[,channel...] rounds [address] [file]
+
+        Reads one sample of an ADC channel.  capture converts the channels
+        rounds times on the target and prints a summary per channel, or
+        saves the timestamped samples to file (.npy or text).  The samples
+        are stored on the target at address, by default in the 64 KiB
+        scratch area at 0x007F0000 below micromon, which holds 32768 of
+        them.  Anything at address is overwritten.
+        """
 
         l = s.split()
+        if l and l[0] == 'capture':
+            self.adc_capture(l[1:])
+            return
+
         if len(l) != 1:
-            print('*** Invalid number of arguments')
+            self.error('Invalid number of arguments')
             return
 
         try:
             channel = int(l[0])
             assert channel in range(0,8)
         except:
-            print('*** Invalid channel')
+            self.error('Invalid channel')
             return
 
-        def init():
-            self.regs.write('ADCCLKENB', 1 << 3)
-            self.regs.write('ADCCON', 0)
-            adccon = 126 << 6
-            self.regs.write('ADCCON', adccon)
-            adccon |= 1 << 14
-            self.regs.write('ADCCON', adccon)
+        self.adc.init()
+        value = self.adc.read(channel)
+        if value is None:
+            self.error('ADC conversion timed out')
+        else:
+            print(value)
+        self.adc.shutdown()
 
-        def read(channel):
-            adccon = self.regs.read('ADCCON') & ~(0x7 << 3)
-            adccon |= (1 << 0) | (channel << 3)
-            self.regs.write('ADCCON', adccon)
+    def adc_capture(self, l):
+        if len(l) not in (2, 3, 4):
+            self.error('Invalid number of arguments')
+            return
 
-            while (self.regs.read('ADCCON') & 0x1):
+        try:
+            channels = [int(c) for c in l[0].split(',')]
+            assert all(c in range(0,8) for c in channels)
+        except:
+            self.error('Invalid channel')
+            return
+
+        try:
+            rounds = int(l[1], 0)
+            assert rounds > 0
+        except:
+            self.error('Rounds must be a positive integer')
+            return
+
+        addr = None
+        if len(l) > 2:
+            try:
+                addr = int(l[2], 0)
+            except ValueError:
                 pass
+            else:
+                del l[2]
+        if len(l) > 3:
+            self.error('Invalid number of arguments')
+            return
+        upper = (1 << 32) - 1
+        if addr is not None and (addr < 0 or addr > upper):
+            self.error(f'Address must be an integer in the range of 0 to {upper}')
+            return
 
-            value = self.regs.read('ADCDAT') & 0x3FF
-            return value
+        try:
+            import numpy
+        except ImportError:
+            self.error('Capturing needs numpy')
+            return
 
-        def shutdown():
-            self.regs.write('ADCCON', 0)
-            self.regs.write('ADCCLKENB', 0)
+        self.adc.init()
+        try:
+            capture = self.adc.capture(channels, rounds, addr)
+        except Exception as inst:
+            self.error(str(inst))
+            return
+        finally:
+            self.adc.shutdown()
+
+        duration = capture.times[-1, -1]
+        print(f'{capture.samples.size} samples in {duration * 1000:.1f} ms')
+        if len(l) == 3:
+            table = numpy.column_stack((capture.times[:, 0],
+                                        capture.samples))
+            if l[2].endswith('.npy'):
+                numpy.save(l[2], table)
+            else:
+                header = 'time ' + ' '.join(f'ch{c}' for c in capture.channels)
+                numpy.savetxt(l[2], table, fmt=['%.6f'] +
+                              ['%d'] * len(capture.channels), header=header)
+            print(f'Saved to {l[2]}')
+            return
 
-        init()
-        value = read(channel)
-        print(value)
-        shutdown()
+        for i, channel in enumerate(capture.channels):
+            column = capture.samples[:, i]
+            print(f'ch{channel}: min {column.min()} max {column.max()} '
+                  f'mean {column.mean():.1f} std {column.std():.1f}')
 
     def do_power(self, s):
         """power [on|off]
 
         Changes the ALIVEGPIO VDDPWRON bit.
         """
+        regs = Registers(self.io)
         if s.lower() in ['1', 'on']:
-            self.regs.write('ALIVEPWRGATEREG', 1)
-            self.regs.write('ALIVEGPIORSTREG', 0)
-            self.regs.write('ALIVEGPIOSETREG', 0x80)
-            self.regs.write('ALIVEGPIOSETREG', 0)
-            self.regs.write('ALIVEPWRGATEREG', 0)
+            regs.write('ALIVEPWRGATEREG', 1)
+            regs.write('ALIVEGPIORSTREG', 0)
+            regs.write('ALIVEGPIOSETREG', 0x80)
+            regs.write('ALIVEGPIOSETREG', 0)
+            regs.write('ALIVEPWRGATEREG', 0)
         elif s.lower() in ['0', 'off']:
-            self.regs.write('ALIVEPWRGATEREG', 1)
-            self.regs.write('ALIVEGPIOSETREG', 0)
-            self.regs.write('ALIVEGPIORSTREG', 0x80)
-            self.regs.write('ALIVEGPIORSTREG', 0)
-            self.regs.write('ALIVEPWRGATEREG', 0)
+            regs.write('ALIVEPWRGATEREG', 1)
+            regs.write('ALIVEGPIOSETREG', 0)
+            regs.write('ALIVEGPIORSTREG', 0x80)
+            regs.write('ALIVEGPIORSTREG', 0)
+            regs.write('ALIVEPWRGATEREG', 0)
             return True
         else:
             print((self.do_power.__doc__))
 
+    def do_verify(self, s):
+        """verify file address
+
+        Compares target memory at address with a file using crcs computed
+        on the target, and lists the ranges that differ.
+        """
+        l = s.split()
+        if len(l) != 2:
+            self.error('Invalid number of arguments')
+            return
+
+        try:
+            addr = int(l[1], 0)
+            assert addr >= 0 and addr <= (1 << 32) - 1
+        except:
+            self.error('Invalid address')
+            return
+
+        try:
+            with open(l[0], 'rb') as fp:
+                data = fp.read()
+        except OSError as inst:
+            self.error(str(inst))
+            return
+
+        try:
+            differ = self.core.verify(addr, data)
+        except Exception as inst:
+            self.error(str(inst))
+            return
+
+        if not differ:
+            print(f'{len(data)} bytes match')
+            return
+        for start, end in differ:
+            print(f'0x{start:08X}-0x{end - 1:08X}  {end - start} byte(s) differ')
+        self.error(f'{len(differ)} range(s) differ')
+
+    def do_stats(self, s):
+        """stats
+
+        Shows per command counts, bytes, latency and errors of this session,
+        and the hit rate of the page cache when it is enabled.
+        """
+        print(format_stats(self.core.stats()))
+        if self.cache:
+            print(format_cache_stats(self.core.cache_stats()))
+
     def do_quit(self, s):
         """quit
 
@@ -326,8 +535,25 @@ class CommandParser(Cmd):
     do_EOF = do_quit
     do_q = do_quit
     
-if __name__ == '__main__':
-    print('\nMicromon Shell 1.0\n')
+def main():
+    parser = argparse.ArgumentParser(description='Micromon shell')
+    parser.add_argument('-x', '--execute', metavar='SCRIPT',
+                        help='run the commands in SCRIPT, - for stdin, '
+                             'instead of prompting')
+    parser.add_argument('-c', '--cache', action='store_true',
+                        help='answer repeated reads of SDRAM from a page '
+                             'cache')
+    args = parser.parse_args()
+
+    cp = CommandParser(args.cache)
+    if args.execute:
+        if args.execute == '-':
+            sys.exit(cp.run_script(sys.stdin))
+        with open(args.execute) as fp:
+            sys.exit(cp.run_script(fp))
 
-    cp = CommandParser()
+    print('\nMicromon Shell 1.0\n')
     cp.cmdloop('Type \'help\' for assistance.')
+
+if __name__ == '__main__':
+    main()
@@ -17,8 +17,6 @@
 
 import os
 from os import path
-import shutil
-import subprocess
 import sys
 
 MICROMON_ROOT = path.normpath(path.join(path.dirname(path.abspath(__file__)), '..'))
@@ -26,23 +24,45 @@ DEFAULT_CONFIG_PATH = path.normpath(path.join(MICROMON_ROOT, 'micromon.default.c
 CONFIG_PATH = path.normpath(path.join(MICROMON_ROOT, 'micromon.cfg'))
 LOCAL_CONFIG_PATH = path.normpath(path.join(os.getcwd(), 'micromon.cfg'))
 MICROMON_BIN = path.normpath(path.join(MICROMON_ROOT, 'build', 'micromon.bin'))
+CACHE_PATH = path.normpath(path.join(MICROMON_ROOT, '.cache'))
+BAUDRATE_CACHE_PATH = path.join(CACHE_PATH, 'baudrates.json')
+JOURNAL_PATH = path.join(CACHE_PATH, 'journal.json')
 
 # need to iterate over path and see if we're in there currently
 sys.path.append(MICROMON_ROOT)
 
-if not path.exists(MICROMON_BIN):
-    result = subprocess.check_call('make', cwd=MICROMON_ROOT)
-    if result:
-        sys.exit(result)
-
 if path.exists(LOCAL_CONFIG_PATH):
     CONFIG_PATH = LOCAL_CONFIG_PATH
 
-if not path.exists(CONFIG_PATH):
-    shutil.copyfile(DEFAULT_CONFIG_PATH, CONFIG_PATH)
+_built = False
+
+def build():
+    """build the micromon binary if it is missing, at most once per run"""
+    global _built
+    if _built:
+        return
+    if not path.exists(MICROMON_BIN):
+        import subprocess
+        result = subprocess.check_call('make', cwd=MICROMON_ROOT)
+        if result:
+            sys.exit(result)
+    _built = True
+
+# the public classes are imported on first access, so tools that only
+# need part of the package do not pay for the rest
+_lazy = {
+    'Core': '.core',
+    'Loader': '.loader',
+    'Target': '.target',
+}
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    from importlib import import_module
+    value = getattr(import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+    return value
 
-from .core import Core
-from .loader import Loader
-from .target import Target
 __all__ = ['Core', 'Loader', 'Target']
 
@@ -0,0 +1,104 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""POLLUX ADC access, single conversions and bulk captures
+
+A capture runs entirely on the target: the adc_capture command converts
+the requested channels round after round into a buffer in SDRAM, which
+is then fetched with one mem_read.  The target has no clock to stamp the
+samples with, so the host times the command and spreads the timestamps
+evenly over that span.  That includes the time taken to send the command
+and its short answer, about a millisecond.
+"""
+
+from collections import namedtuple
+from .core import SCRATCH_ADDR, SCRATCH_SIZE
+from .registers import Registers
+
+# samples are captured into the scratch area unless told otherwise, it
+# holds this many
+CAPTURE_MAX_SAMPLES = SCRATCH_SIZE // 2
+
+Capture = namedtuple('Capture', ('channels', 'times', 'samples'))
+Capture.__doc__ = """channels is the list of channels, samples a uint16 array
+with a row per round and a column per channel, times the matching
+float64 array of seconds since the capture started"""
+
+class Adc:
+    def __init__(self, core):
+        self.core = core
+        self.regs = Registers(core)
+
+    def init(self):
+        self.regs.write('ADCCLKENB', 1 << 3)
+        self.regs.write('ADCCON', 0)
+        adccon = 126 << 6
+        self.regs.write('ADCCON', adccon)
+        adccon |= 1 << 14
+        self.regs.write('ADCCON', adccon)
+
+    def shutdown(self):
+        self.regs.write('ADCCON', 0)
+        self.regs.write('ADCCLKENB', 0)
+
+    def read(self, channel):
+        """one conversion, returns None if it does not finish"""
+        # select the channel and start, in one message
+        r = Registers.lookup('ADCCON')
+        self.core.rmw(r.addr, r.bits, ~(0x7 << 3), (1 << 0) | (channel << 3))
+
+        if not self.regs.wait_bit('ADCCON', 0, False):
+            return None
+
+        value = self.regs.read('ADCDAT') & 0x3FF
+        return value
+
+    def capture(self, channels, rounds, addr=None):
+        """convert every channel in channels rounds times on the target
+        into the buffer at addr, returns a Capture.  Without addr the
+        scratch area below micromon is used, which leaves the rest of
+        SDRAM alone but holds at most CAPTURE_MAX_SAMPLES samples.  The
+        ADC must be initialized."""
+        import numpy
+
+        channels = sorted(set(channels))
+        if not channels or not all(c in range(8) for c in channels):
+            raise ValueError('Channels must be in the range of 0 to 7')
+        mask = sum(1 << c for c in channels)
+        size = rounds * len(channels)
+        if addr is None:
+            if size > CAPTURE_MAX_SAMPLES:
+                raise ValueError('Captures of more than %d samples need a '
+                                 'buffer address' % CAPTURE_MAX_SAMPLES)
+            addr = SCRATCH_ADDR
+
+        count, elapsed = self.core.adc_capture(addr, mask, rounds)
+        if count is None:
+            raise Exception('ADC capture did not finish')
+        if count != size:
+            raise Exception('ADC conversion timed out')
+
+        samples = numpy.empty((rounds, len(channels)), dtype='<u2')
+        if not self.core.mem_read_into(addr, size * 2, samples):
+            raise Exception('ADC capture read back failed')
+
+        # the target converts in channel order, sample k of size finished
+        # at about (k + 1) / size of the capture
+        times = numpy.arange(1, size + 1, dtype=numpy.float64)
+        times *= elapsed / size
+        return Capture(channels, times.reshape(rounds, len(channels)),
+                       samples.astype(numpy.uint16))
@@ -0,0 +1,285 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""asyncio counterparts of Target and Core
+
+Booting is still done with the blocking Loader, open_core() runs it in
+an executor.  Once the core is up the serial port is switched to non
+blocking mode and driven from the event loop, so a single loop can talk
+to many boards and do host side work while the UARTs drain.  This needs
+a serial port with a selectable file descriptor (POSIX).
+"""
+
+import asyncio
+import fcntl
+import os
+
+from .config import Config
+from .core import (Core, _Commands, _cmd_addr, _cmd_addr_u8, _cmd_addr_u16,
+                   _cmd_addr_u32)
+from .loader import Loader
+from .log import Log
+from .stats import Stats
+from .target import Target, u8, u16, u32
+
+class AsyncTarget:
+    """non-blocking serial transport for a target that is already booted"""
+    def __init__(self, target):
+        self.target = target
+        self.port = target.port
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.timeouts = 0
+        self._fd = target.sp.fileno()
+        self._timeout = Config.get('target.data_timeout')
+        self._loop = asyncio.get_running_loop()
+        self._buffer = bytearray()
+        self._waiter = None
+
+        flags = fcntl.fcntl(self._fd, fcntl.F_GETFL)
+        fcntl.fcntl(self._fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self._loop.add_reader(self._fd, self._on_readable)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, tb):
+        self.close()
+
+    def close(self):
+        """hand the port back to blocking use"""
+        self._loop.remove_reader(self._fd)
+        flags = fcntl.fcntl(self._fd, fcntl.F_GETFL)
+        fcntl.fcntl(self._fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+
+    @property
+    def baudrate(self):
+        return self.target.baudrate
+
+    @property
+    def block_size(self):
+        return self.target.block_size
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        self._buffer += data
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _wait_data(self, timeout):
+        self._waiter = self._loop.create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiter = None
+
+    async def write(self, data):
+        view = memoryview(data).cast('B')
+        self.bytes_sent += len(view)
+        while view:
+            try:
+                n = os.write(self._fd, view)
+            except BlockingIOError:
+                n = 0
+            view = view[n:]
+            if view:
+                await self._writable()
+
+    async def _writable(self):
+        ready = self._loop.create_future()
+        def on_writable():
+            self._loop.remove_writer(self._fd)
+            if not ready.done():
+                ready.set_result(None)
+        self._loop.add_writer(self._fd, on_writable)
+        try:
+            await ready
+        finally:
+            self._loop.remove_writer(self._fd)
+
+    async def read(self, size, wait=0):
+        """read up to size bytes, giving up after data_timeout plus wait
+        seconds without any new data arriving"""
+        while len(self._buffer) < size:
+            if not await self._wait_data(self._timeout + wait):
+                self.timeouts += 1
+                break
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_received += len(data)
+        return data
+
+    async def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        size = len(view)
+        count = 0
+        while count < size:
+            if not self._buffer and not await self._wait_data(self._timeout):
+                self.timeouts += 1
+                break
+            n = min(size - count, len(self._buffer))
+            view[count:count+n] = self._buffer[:n]
+            del self._buffer[:n]
+            count += n
+        self.bytes_received += count
+        return count
+
+    async def _read_struct(self, t):
+        data = await self.read(t.size)
+        if len(data) != t.size:
+            return None
+        return t.unpack(data)[0]
+
+    async def read_u8(self):
+        return await self._read_struct(u8)
+
+    async def read_u16(self):
+        return await self._read_struct(u16)
+
+    async def read_u32(self):
+        return await self._read_struct(u32)
+
+
+class AsyncCore(_Commands):
+    """awaitable interface to the core, the commands are the ones of Core
+    with the same arguments and results.  Commands to one board must not
+    be interleaved, await each before issuing the next."""
+
+    def __init__(self, target):
+        self._target = target
+        self._stats = Stats(target)
+
+    async def _drive(self, op):
+        """run one of the _Commands ops, host side work such as
+        compression goes to the default executor"""
+        loop = asyncio.get_running_loop()
+        result = None
+        try:
+            while True:
+                request = op.send(result)
+                kind = request[0]
+                if kind == 'write':
+                    result = await self._target.write(request[1])
+                elif kind == 'send':
+                    result = await self._write(request[1])
+                elif kind == 'read':
+                    result = await self._target.read(request[1], request[2])
+                elif kind == 'readinto':
+                    result = await self._target.readinto(request[1])
+                else:
+                    result = await loop.run_in_executor(None, request[1],
+                                                        *request[2:])
+        except StopIteration as stop:
+            return stop.value
+
+    async def write_u8(self, addr, data):
+        await self._drive(self._op_write('write_u8', _cmd_addr_u8, addr, data))
+
+    async def write_u16(self, addr, data):
+        await self._drive(self._op_write('write_u16', _cmd_addr_u16, addr,
+                                         data))
+
+    async def write_u32(self, addr, data):
+        await self._drive(self._op_write('write_u32', _cmd_addr_u32, addr,
+                                         data))
+
+    async def rmw(self, addr, width, and_mask=0xFFFFFFFF, or_mask=0,
+                  xor_mask=0):
+        await self._drive(self._op_rmw(addr, width, and_mask, or_mask,
+                                       xor_mask))
+
+    async def read_u8(self, addr):
+        return await self._drive(self._op_read_struct('read_u8', addr, u8))
+
+    async def read_u16(self, addr):
+        return await self._drive(self._op_read_struct('read_u16', addr, u16))
+
+    async def read_u32(self, addr):
+        return await self._drive(self._op_read_struct('read_u32', addr, u32))
+
+    async def poll(self, addr, mask, value, timeout_us=100000, width=32):
+        return await self._drive(self._op_poll(addr, mask, value, timeout_us,
+                                               width))
+
+    async def adc_capture(self, addr, channels, rounds, timeout=None):
+        return await self._drive(self._op_adc_capture(addr, channels, rounds,
+                                                      timeout))
+
+    async def mem_fill(self, addr, size, pattern=0, width=8):
+        return await self._drive(self._op_mem_fill(addr, size, pattern,
+                                                   width))
+
+    async def mem_write(self, addr, data, compress=None, resume=False):
+        return await self._drive(self._op_mem_write(addr, data, compress,
+                                                    resume))
+
+    async def mem_read(self, addr, size):
+        data = bytearray(size)
+        crc_ok = await self.mem_read_into(addr, size, data)
+        return (data, crc_ok)
+
+    async def mem_read_into(self, addr, size, out):
+        return await self._drive(self._op_mem_read_into(addr, size, out))
+
+    async def mem_crc(self, addr, size, block_size=None):
+        return await self._drive(self._op_mem_crc(addr, size, block_size))
+
+    async def run(self, exec_at):
+        await self._drive(self._op_write('run', _cmd_addr, exec_at))
+
+    async def run_kernel(self, exec_at, machine_type):
+        await self._drive(self._op_write('run_kernel', _cmd_addr_u32, exec_at,
+                                         machine_type))
+
+    async def _write(self, data):
+        # the target.block_size setting, without the adaptive probing
+        block_size = self._target.block_size
+        view = memoryview(data).cast('B')
+        for offset in range(0, len(view), block_size):
+            await self._target.write(view[offset:offset+block_size])
+
+
+async def open_core(serial_port=None):
+    """boot the target on serial_port in an executor and return an
+    AsyncCore for it"""
+    def boot():
+        target = None
+        try:
+            target = Target(serial_port)
+            Loader(target)
+            Core(target)
+            return target
+        except SystemExit:
+            # Target and Loader report their errors and exit, which must
+            # not reach an event loop that drives other boards
+            error = Exception('Unable to open or boot the target')
+        except Exception as inst:
+            error = inst
+        if target is not None:
+            target.close()
+        raise error
+
+    loop = asyncio.get_running_loop()
+    with Log.debug('Booting %(port)s', port=serial_port or 'target'):
+        target = await loop.run_in_executor(None, boot)
+    return AsyncCore(AsyncTarget(target))
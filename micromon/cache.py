@@ -0,0 +1,228 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""read cache for plain RAM on the target
+
+CachedCore wraps a Core.  read_u8, read_u16 and read_u32 of an address in
+one of its RAM ranges fetch the whole page around it with one mem_read
+and answer later reads of that page from the copy.  Pages holding a
+register from the register table are never cached, and neither are reads
+that straddle two pages.
+
+The cache only knows about writes made through it: every write drops the
+pages it touches, and run, run_kernel and adc_capture flush the whole
+cache.  Batches answer reads from the cache as well, except reads of pages
+written earlier in the same batch, which are sent along with the writes.  Memory changed by DMA or by code running on the target is
+not noticed, use invalidate() for that.
+"""
+
+from .core import Batch, Future
+from .registers import Registers
+from .target import u8, u16, u32
+from collections import OrderedDict
+
+# SDRAM, all of it on the largest boards
+RAM = ((0x00000000, 0x08000000),)
+
+class _Batch(Batch):
+    def __init__(self, core):
+        Batch.__init__(self, core)
+        self._written = set()
+
+    def _invalidate(self, addr, size):
+        self._core.invalidate(addr, size)
+        page_size = self._core.page_size
+        self._written.update(range(addr // page_size,
+                                   (addr + size - 1) // page_size + 1))
+
+    def write_u8(self, addr, data):
+        self._invalidate(addr, 1)
+        Batch.write_u8(self, addr, data)
+
+    def write_u16(self, addr, data):
+        self._invalidate(addr, 2)
+        Batch.write_u16(self, addr, data)
+
+    def write_u32(self, addr, data):
+        self._invalidate(addr, 4)
+        Batch.write_u32(self, addr, data)
+
+    def rmw(self, addr, width, *args, **kwargs):
+        self._invalidate(addr, width // 8)
+        Batch.rmw(self, addr, width, *args, **kwargs)
+
+    def _queue_read(self, command, addr, t):
+        def queue(addr):
+            return Batch._queue_read(self, command, addr, t)
+        if addr // self._core.page_size in self._written:
+            return queue(addr)
+        value = self._core._read(addr, t, queue)
+        if isinstance(value, Future):
+            return value
+        future = Future(t)
+        future._set(t.pack(value))
+        return future
+
+    def flush(self):
+        self._written.clear()
+        Batch.flush(self)
+
+    def discard(self):
+        self._written.clear()
+        Batch.discard(self)
+
+
+class CachedCore:
+    """a Core that serves small reads of RAM from cached pages, anything
+    it does not override is passed to the core"""
+    def __init__(self, core, ranges=RAM, page_size=256, pages=256):
+        self.core = core
+        self.ranges = tuple(ranges)
+        self.page_size = page_size
+        self.max_pages = pages
+        self._pages = OrderedDict()
+        self._cacheable = {}
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __getattr__(self, name):
+        return getattr(self.core, name)
+
+    def _is_cacheable(self, n):
+        cacheable = self._cacheable.get(n)
+        if cacheable is None:
+            start = n * self.page_size
+            end = start + self.page_size
+            cacheable = (any(lo <= start and end <= hi
+                             for lo, hi in self.ranges) and
+                         not Registers.in_range(start, end))
+            self._cacheable[n] = cacheable
+        return cacheable
+
+    def _read(self, addr, t, read):
+        n, offset = divmod(addr, self.page_size)
+        if offset + t.size > self.page_size or not self._is_cacheable(n):
+            self.uncached += 1
+            return read(addr)
+
+        page = self._pages.get(n)
+        if page is not None:
+            self.hits += 1
+            self._pages.move_to_end(n)
+        else:
+            self.misses += 1
+            page, crc_ok = self.core.mem_read(n * self.page_size,
+                                              self.page_size)
+            if not crc_ok:
+                return read(addr)
+            self._pages[n] = page
+            if len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+                self.evictions += 1
+        return t.unpack_from(page, offset)[0]
+
+    def invalidate(self, addr=None, size=None):
+        """drop the cached pages overlapping size bytes at addr, or all"""
+        if addr is None:
+            dropped = list(self._pages)
+        else:
+            first = addr // self.page_size
+            last = (addr + max(size, 1) - 1) // self.page_size
+            dropped = [n for n in self._pages if first <= n <= last]
+        for n in dropped:
+            del self._pages[n]
+        self.invalidations += len(dropped)
+
+    def read_u8(self, addr):
+        return self._read(addr, u8, self.core.read_u8)
+
+    def read_u16(self, addr):
+        return self._read(addr, u16, self.core.read_u16)
+
+    def read_u32(self, addr):
+        return self._read(addr, u32, self.core.read_u32)
+
+    def write_u8(self, addr, data):
+        self.invalidate(addr, 1)
+        self.core.write_u8(addr, data)
+
+    def write_u16(self, addr, data):
+        self.invalidate(addr, 2)
+        self.core.write_u16(addr, data)
+
+    def write_u32(self, addr, data):
+        self.invalidate(addr, 4)
+        self.core.write_u32(addr, data)
+
+    def rmw(self, addr, width, *args, **kwargs):
+        self.invalidate(addr, width // 8)
+        self.core.rmw(addr, width, *args, **kwargs)
+
+    def mem_write(self, addr, data, *args, **kwargs):
+        self.invalidate(addr, memoryview(data).nbytes)
+        return self.core.mem_write(addr, data, *args, **kwargs)
+
+    def mem_write_reliable(self, addr, data, *args, **kwargs):
+        self.invalidate(addr, memoryview(data).nbytes)
+        return self.core.mem_write_reliable(addr, data, *args, **kwargs)
+
+    def mem_sync(self, addr, data, *args, **kwargs):
+        self.invalidate(addr, memoryview(data).nbytes)
+        return self.core.mem_sync(addr, data, *args, **kwargs)
+
+    def mem_fill(self, addr, size, *args, **kwargs):
+        self.invalidate(addr, size)
+        return self.core.mem_fill(addr, size, *args, **kwargs)
+
+    def adc_capture(self, *args, **kwargs):
+        self.invalidate()
+        return self.core.adc_capture(*args, **kwargs)
+
+    def run(self, *args, **kwargs):
+        self.invalidate()
+        self.core.run(*args, **kwargs)
+
+    def run_kernel(self, *args, **kwargs):
+        self.invalidate()
+        self.core.run_kernel(*args, **kwargs)
+
+    def batch(self):
+        """a Core.batch() that answers reads from the cache"""
+        return _Batch(self)
+
+    def cache_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'uncached': self.uncached,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'pages': len(self._pages),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def format_cache_stats(stats):
+    """cache_stats() as one line"""
+    return ('cache: %(hits)d hits, %(misses)d misses (%(percent).1f%% hit '
+            'rate), %(uncached)d uncached, %(evictions)d evictions, '
+            '%(invalidations)d invalidations, %(pages)d pages held' %
+            dict(stats, percent=stats['hit_rate'] * 100.0))
@@ -16,17 +16,23 @@
 #
 
 import micromon
-import configparser
+from os import path
 
 class ConfigSingleton:
     options = {
         'general.log_level':
             {'type': str, 'default': 'info',
              'values': ['fatal', 'error', 'warning', 'info', 'debug']},
+        'general.progress_rate':
+            {'type': float, 'default': 10.0},
+        'general.stats_file':
+            {'type': str, 'default': ''},
         'target.serial_port':
             {'type': str},
         'target.data_timeout':
             {'type': float, 'default': 1.0},
+        'target.block_size':
+            {'type': str, 'default': '512'},
         'target.uart_boot_pin':
             {'type': str, 'default': 'none',
              'values': ['none', 'rts', '!rts', 'dtr', '!dtr']},
@@ -45,18 +51,41 @@ class ConfigSingleton:
             {'type': str, 'default': 'auto',
              'values': ['auto', '512', '16k']},
         'monitor.baudrate':
-            {'type': int, 'default': 115200, 
-             'values': [19200, 38400, 57600, 115200, 230400, 460800, 614400,
-                        921600, 1500000]},
+            {'type': str, 'default': '115200',
+             'values': ['auto', '19200', '38400', '57600', '115200', '230400',
+                        '460800', '614400', '921600', '1500000']},
     }
 
     def __init__(self):
-        self.config = configparser.SafeConfigParser()
-        self.config.readfp(open(micromon.CONFIG_PATH))
+        self._config = None
+
+    @property
+    def config(self):
+        """the parsed configuration, read on first use"""
+        if self._config is None:
+            import configparser
+            import shutil
+            if not path.exists(micromon.CONFIG_PATH):
+                shutil.copyfile(micromon.DEFAULT_CONFIG_PATH,
+                                micromon.CONFIG_PATH)
+            config = configparser.SafeConfigParser()
+            config.readfp(open(micromon.CONFIG_PATH))
+            self._config = config
+        return self._config
 
     def load(self, filename):
         self.config.readfp(open(filename), filename)
         
+    def set(self, name, value):
+        if name not in self.options:
+            raise ValueError('unknown setting: %s' % name)
+
+        l = name.split('.', 1)
+        l[1] = l[1].replace('_', ' ')
+        if not self.config.has_section(l[0]):
+            self.config.add_section(l[0])
+        self.config.set(l[0], l[1], str(value))
+
     def get(self, name):
         if name not in self.options:
             raise ValueError('unknown setting: %s' % name)
@@ -16,9 +16,14 @@
 #
 
 from binascii import crc32
-from .loader import Loader
+from . import lz
+from .config import Config
 from .log import Log
-from time import sleep
+from .stats import Stats
+from .target import u8, u16, u32
+from struct import Struct
+from collections import deque
+from time import perf_counter, sleep
 
 COMMANDS = (
   'nop',
@@ -31,107 +36,1026 @@ COMMANDS = (
   'mem_write',
   'mem_read',
   'run',
-  'run_kernel'
+  'run_kernel',
+  'mem_write_lz',
+  'mem_crc',
+  'mem_write_blocks',
+  'mem_read_blocks',
+  'mem_poll',
+  'adc_capture',
+  'mem_fill',
+  'rmw'
 )
 
-class Core:
+# SDRAM just below micromon, which runs from 0x00800000, that the tools
+# use for their own buffers instead of memory the user may have loaded
+SCRATCH_ADDR = 0x007F0000
+SCRATCH_SIZE = 0x00010000
+
+# framing of mem_write_blocks and mem_read_blocks, see main.c
+BLOCK_SYNC = 0x4b4c4275
+BLOCK_START = 0xFFFFFFFE
+BLOCK_END = 0xFFFFFFFF
+BLOCK_ACK = 0x06
+BLOCK_NAK = 0x15
+MAX_BLOCK_SIZE = 4096
+
+_cmd_addr = Struct('<BL')
+_cmd_addr_u8 = Struct('<BLB')
+_cmd_addr_u16 = Struct('<BLH')
+_cmd_addr_u32 = Struct('<BLL')
+_cmd_mem_write_lz = Struct('<BLLLL')
+_cmd_mem_crc = Struct('<BLLL')
+_cmd_mem_poll = Struct('<BLBLLL')
+_poll_response = Struct('<LL')
+_cmd_adc_capture = Struct('<BLBL')
+_cmd_mem_fill = Struct('<BLLLB')
+_cmd_rmw = Struct('<BLBLLL')
+_blocks_header = Struct('<LLL')
+_block_header = Struct('<LL')
+_block_status = Struct('<BLL')
+
+# resumable uploads are sent and journaled in blocks of this size
+_journal_block_size = 65536
+
+# compression is only considered for uploads of at least this size, and
+# its cost is estimated by compressing this much of the image
+_compress_min_size = 16384
+_compress_sample_size = 65536
+
+# generous upper bound for one conversion of adc_capture in seconds
+_adc_sample_time = 0.0001
+
+# mem_write sends runs of a repeated byte, halfword or word at least this
+# long as mem_fill, and the target fills and crcs at least a byte in this
+# many seconds
+_fill_min_run = 1024
+_fill_byte_time = 1e-7
+
+# the target crcs at least a byte of memory in this many seconds
+_crc_byte_time = 1e-7
+
+# mem_write_reliable and mem_read_reliable give up after this many seconds
+# plus this many times the time the data takes on the wire, and wait this
+# long for the line to go quiet after giving up on a transfer, on top of
+# the time the rest of it takes on the wire
+_blocks_min_timeout = 10.0
+_blocks_wire_factor = 4
+_blocks_drain_time = 5.0
+
+def compression_pays(data, baudrate):
+    """estimate whether sending data compressed finishes sooner"""
+    return _compression_estimate(data, baudrate)[0]
+
+def _compression_estimate(data, baudrate):
+    """compression_pays() and, when the sample was all of data, the
+    compressed data so that it is not compressed a second time"""
+    size = len(data)
+    if size < _compress_min_size:
+        return (False, None)
+
+    sample = data[:_compress_sample_size]
+    start = perf_counter()
+    packed = lz.compress(sample)
+    elapsed = perf_counter() - start
+
+    # 10 bit times per byte: start, 8 data bits, stop
+    byte_time = 10.0 / baudrate
+    raw_time = size * byte_time
+    lz_time = size * (elapsed + len(packed) * byte_time) / len(sample)
+    return (lz_time < raw_time, packed if len(sample) == size else None)
+
+def _runs(blocks):
+    """group sorted block numbers into (first, last) runs of neighbours"""
+    runs = []
+    for block in blocks:
+        if runs and runs[-1][1] == block - 1:
+            runs[-1][1] = block
+        else:
+            runs.append([block, block])
+    return runs
+
+def _fill_runs(view):
+    """(offset, size, pattern, width) of every run in view that mem_fill
+    can produce, in order.
+
+    Runs are found as aligned u32 words equal to their neighbours.  One
+    long enough to count covers two words _fill_min_run / 2 bytes apart,
+    so only those are compared until a pair matches, and the run is then
+    grown word by word and finally by the odd bytes at either end."""
+    size = len(view)
+    words = view[:size // 4 * 4].cast('I')
+    count = len(words)
+    min_words = _fill_min_run // 4
+    stride = min_words // 2
+    runs = []
+    end = 0
+    for k in range(0, count - stride, stride):
+        if k < end or words[k] != words[k + stride]:
+            continue
+        word = words[k]
+        first = k
+        while first > end and words[first - 1] == word:
+            first -= 1
+        last = k + 1
+        while last < count and words[last] == word:
+            last += 1
+        if last - first < min_words:
+            continue
+        end = last
+
+        start = first * 4
+        prev_end = runs[-1][0] + runs[-1][1] if runs else 0
+        while start > prev_end and view[start - 1] == view[start + 3]:
+            start -= 1
+        stop = last * 4
+        while stop < size and view[stop] == view[stop - 4]:
+            stop += 1
+
+        pattern = bytes(view[start:start+4])
+        if pattern[1:] == pattern[:3]:
+            width = 8
+        elif pattern[:2] == pattern[2:]:
+            width = 16
+        else:
+            width = 32
+        runs.append((start, stop - start, u32.unpack(pattern)[0], width))
+    return runs
+
+def _diff(local, remote, addr):
+    """(start, end) address ranges where two equal length buffers differ"""
+    ranges = []
+    start = None
+    for i in range(len(local)):
+        if local[i] != remote[i]:
+            if start is None:
+                start = i
+        elif start is not None:
+            ranges.append((addr + start, addr + i))
+            start = None
+    if start is not None:
+        ranges.append((addr + start, addr + len(local)))
+    return ranges
+
+def _merge(ranges):
+    """sort (start, end) ranges and join the ones that touch"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and merged[-1][1] >= start:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class Future:
+    """value of a read queued in a batch, available once it is flushed"""
+    def __init__(self, t):
+        self._t = t
+        self._value = None
+        self._done = False
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            raise Exception('Batch has not been flushed')
+        return self._value
+
+    def _set(self, data):
+        if data is not None and len(data) == self._t.size:
+            self._value = self._t.unpack(data)[0]
+        self._done = True
+
+
+class Batch:
+    """queues commands and sends them to the target as one transaction"""
+    def __init__(self, core):
+        self._core = core
+        self._request = bytearray()
+        self._futures = []
+        # (opcode, bytes out, bytes in) of each queued command, for stats
+        self._commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        if type is None:
+            self.flush()
+        else:
+            self.discard()
+
+    def __len__(self):
+        return len(self._futures)
+
+    def write_u8(self, addr, data):
+        self._request += _cmd_addr_u8.pack(COMMANDS.index('write_u8'), addr,
+                                           data)
+        self._commands.append(('write_u8', _cmd_addr_u8.size, 0))
+
+    def write_u16(self, addr, data):
+        self._request += _cmd_addr_u16.pack(COMMANDS.index('write_u16'), addr,
+                                            data)
+        self._commands.append(('write_u16', _cmd_addr_u16.size, 0))
+
+    def write_u32(self, addr, data):
+        self._request += _cmd_addr_u32.pack(COMMANDS.index('write_u32'), addr,
+                                            data)
+        self._commands.append(('write_u32', _cmd_addr_u32.size, 0))
+
+    def rmw(self, addr, width, and_mask=0xFFFFFFFF, or_mask=0, xor_mask=0):
+        self._request += _cmd_rmw.pack(COMMANDS.index('rmw'), addr, width,
+                                       and_mask & 0xFFFFFFFF, or_mask,
+                                       xor_mask)
+        self._commands.append(('rmw', _cmd_rmw.size, 0))
+
+    def read_u8(self, addr):
+        return self._queue_read('read_u8', addr, u8)
+
+    def read_u16(self, addr):
+        return self._queue_read('read_u16', addr, u16)
+
+    def read_u32(self, addr):
+        return self._queue_read('read_u32', addr, u32)
+
+    def _queue_read(self, command, addr, t):
+        self._request += _cmd_addr.pack(COMMANDS.index(command), addr)
+        self._commands.append((command, _cmd_addr.size, t.size))
+        future = Future(t)
+        self._futures.append(future)
+        return future
+
+    def flush(self):
+        """send all queued commands in one write and collect every response
+        with one bulk read"""
+        request, self._request = self._request, bytearray()
+        futures, self._futures = self._futures, []
+        commands, self._commands = self._commands, []
+        if not request:
+            return
+
+        target = self._core._target
+        start = perf_counter()
+        target.write(request)
+
+        size = sum(future._t.size for future in futures)
+        response = target.read(size) if size else b''
+
+        offset = 0
+        for future in futures:
+            end = offset + future._t.size
+            future._set(response[offset:end] if end <= len(response) else None)
+            offset = end
+
+        # the round trip is shared evenly by the batched commands
+        elapsed = (perf_counter() - start) / len(commands)
+        received = len(response)
+        for name, bytes_out, size in commands:
+            bytes_in = min(size, received)
+            received -= bytes_in
+            self._core._stats.add(name, bytes_out, bytes_in, elapsed,
+                                  int(bytes_in != size))
+
+    def discard(self):
+        self._request = bytearray()
+        self._futures = []
+        self._commands = []
+
+
+class _Commands:
+    """encoding and decoding of the core's commands, shared by Core and
+    aio.AsyncCore.  Each _op_ method is a generator that yields the
+    transfers it needs and is sent back their results:
+
+    ('write', data)         send a command, gives None
+    ('send', data)          send a bulk payload, gives None
+    ('read', size, wait)    read a response the target may take up to wait
+                            seconds longer than usual to send, gives bytes
+    ('readinto', buffer)    fill buffer, gives the number of bytes read
+    ('call', fn, *args)     host side work, gives fn(*args)
+
+    The subclass runs an op with _drive() and returns its value."""
+    block_size = 512
+
+    def stats(self):
+        """snapshot of the per command counters of this session, see
+        stats.py"""
+        return self._stats.snapshot()
+
+    def _wire_time(self, size):
+        """seconds size bytes take on the wire.  Sent data can still be in
+        buffers on the way when the write returns, the answer to it comes
+        that much later."""
+        return size * 10.0 / self._target.baudrate
+
+    def _op_write(self, name, t, *args):
+        start = self._stats.begin()
+        yield ('write', t.pack(COMMANDS.index(name), *args))
+        self._stats.end(name, start)
+
+    def _op_rmw(self, addr, width, and_mask, or_mask, xor_mask):
+        if width not in (8, 16, 32):
+            raise ValueError('Invalid width')
+        yield from self._op_write('rmw', _cmd_rmw, addr, width,
+                                  and_mask & 0xFFFFFFFF, or_mask, xor_mask)
+
+    def _op_read_struct(self, name, addr, t):
+        start = self._stats.begin()
+        yield ('write', _cmd_addr.pack(COMMANDS.index(name), addr))
+        data = yield ('read', t.size, 0)
+        self._stats.end(name, start)
+        if len(data) != t.size:
+            return None
+        return t.unpack(data)[0]
+
+    def _op_poll(self, addr, mask, value, timeout_us, width):
+        if width not in (8, 16, 32):
+            raise ValueError('Invalid width')
+        start = self._stats.begin()
+        yield ('write', _cmd_mem_poll.pack(COMMANDS.index('mem_poll'), addr,
+                                           width, mask, value, timeout_us))
+        response = yield ('read', _poll_response.size, timeout_us / 1e6)
+        ok = len(response) == _poll_response.size
+        self._stats.end('mem_poll', start, ok)
+        if not ok:
+            return (None, 0)
+        return _poll_response.unpack(response)
+
+    def _op_adc_capture(self, addr, channels, rounds, timeout):
+        samples = rounds * bin(channels & 0xFF).count('1')
+        if timeout is None:
+            timeout = samples * _adc_sample_time
+        start = self._stats.begin()
+        yield ('write', _cmd_adc_capture.pack(COMMANDS.index('adc_capture'),
+                                              addr, channels, rounds))
+        sent = perf_counter()
+        response = yield ('read', u32.size, timeout)
+        elapsed = perf_counter() - sent
+        ok = len(response) == u32.size
+        self._stats.end('adc_capture', start, ok)
+        if not ok:
+            return (None, elapsed)
+        return (u32.unpack(response)[0], elapsed)
+
+    def _op_mem_fill(self, addr, size, pattern, width):
+        if width not in (8, 16, 32):
+            raise ValueError('Invalid width')
+        if width == 8:
+            word = u32.pack((pattern & 0xFF) * 0x01010101)
+        elif width == 16:
+            word = u32.pack((pattern & 0xFFFF) * 0x00010001)
+        else:
+            word = u32.pack(pattern & 0xFFFFFFFF)
+        start = self._stats.begin()
+        yield ('write', _cmd_mem_fill.pack(COMMANDS.index('mem_fill'), addr,
+                                           size, pattern, width))
+        response = yield ('read', u32.size, size * _fill_byte_time)
+        local_crc32 = crc32((word * (size // 4 + 1))[:size]) & 0xFFFFFFFF
+        crc_ok = (len(response) == u32.size and
+                  u32.unpack(response)[0] == local_crc32)
+        self._stats.end('mem_fill', start, crc_ok)
+        return crc_ok
+
+    def _op_mem_write(self, addr, data, compress, resume):
+        if resume:
+            return (yield from self._op_mem_write_resume(addr, data,
+                                                         compress))
+        if len(data) >= _fill_min_run:
+            view = memoryview(data).cast('B')
+            runs = yield ('call', _fill_runs, view)
+            if runs:
+                return (yield from self._op_mem_write_runs(addr, view, runs,
+                                                           compress))
+        return (yield from self._op_mem_write_data(addr, data, compress))
+
+    def _op_mem_write_runs(self, addr, view, runs, compress):
+        offset = 0
+        for run_offset, size, pattern, width in runs:
+            if run_offset > offset and not (
+                    yield from self._op_mem_write_data(
+                        addr + offset, view[offset:run_offset], compress)):
+                return False
+            if not (yield from self._op_mem_fill(addr + run_offset, size,
+                                                 pattern, width)):
+                return False
+            offset = run_offset + size
+        if offset < len(view):
+            return (yield from self._op_mem_write_data(
+                addr + offset, view[offset:], compress))
+        return True
+
+    def _op_mem_write_data(self, addr, data, compress):
+        packed = None
+        if compress is None:
+            compress, packed = yield ('call', _compression_estimate, data,
+                                      self._target.baudrate)
+        if compress:
+            return (yield from self._op_mem_write_lz(addr, data, packed))
+
+        start = self._stats.begin()
+        yield ('write', _cmd_addr_u32.pack(COMMANDS.index('mem_write'), addr,
+                                           len(data)))
+        yield ('send', data)
+        response = yield ('read', u32.size, self._wire_time(len(data)))
+        local_crc32 = crc32(data) & 0xFFFFFFFF
+        crc_ok = (len(response) == u32.size and
+                  u32.unpack(response)[0] == local_crc32)
+        self._stats.end('mem_write', start, crc_ok)
+        return crc_ok
+
+    def _op_mem_write_resume(self, addr, data, compress):
+        from hashlib import sha1
+        from .journal import Journal
+
+        size = len(data)
+        view = memoryview(data).cast('B')
+        block_size = _journal_block_size
+        blocks = (size + block_size - 1) // block_size
+        port = self._target.port
+        digest = (yield ('call', sha1, view)).hexdigest()
+
+        journal = Journal()
+        verified = journal.verified(port, addr, digest, size, block_size)
+        start = 0
+        if verified:
+            local = [crc32(view[offset:offset+block_size]) & 0xFFFFFFFF
+                     for offset in range(0, verified * block_size,
+                                         block_size)]
+            remote = (yield from self._op_mem_crc(
+                addr, min(size, verified * block_size), block_size)) or []
+            while (start < verified and start < len(remote) and
+                   remote[start] == local[start]):
+                start += 1
+            if start == blocks:
+                Log.info('Image is already on the target').single()
+            elif start:
+                Log.info('Resuming upload at block %(block)d of %(blocks)d',
+                         block=start + 1, blocks=blocks).single()
+
+        for block in range(start, blocks):
+            offset = block * block_size
+            if not (yield from self._op_mem_write(
+                    addr + offset, view[offset:offset+block_size], compress,
+                    False)):
+                return False
+            journal.update(port, addr, digest, size, block_size, block + 1)
+        return True
+
+    def _op_mem_write_lz(self, addr, data, packed=None):
+        size = len(data)
+        if packed is None:
+            with Log.debug('Compressing %(size)d bytes', size=size):
+                packed = yield ('call', lz.compress, data)
+        if len(packed) >= size:
+            return (yield from self._op_mem_write_data(addr, data, False))
+
+        # the packed stream is decoded in place from the end of the
+        # destination, preserve whatever it overhangs
+        margin = lz.inplace_margin(packed, size)
+        if margin:
+            saved = bytearray(margin)
+            if not (yield from self._op_mem_read_into(addr + size, margin,
+                                                      saved)):
+                return False
+
+        src = addr + size + margin - len(packed)
+        start = self._stats.begin()
+        yield ('write', _cmd_mem_write_lz.pack(COMMANDS.index('mem_write_lz'),
+                                               addr, size, src, len(packed)))
+        yield ('send', packed)
+        response = yield ('read', 2 * u32.size, self._wire_time(len(packed)))
+        local_crc32 = crc32(data) & 0xFFFFFFFF
+        crc_ok = (len(response) == 2 * u32.size and
+                  response == u32.pack(size) + u32.pack(local_crc32))
+        self._stats.end('mem_write_lz', start, crc_ok)
+
+        if margin and not (yield from self._op_mem_write_data(
+                addr + size, saved, False)):
+            return False
+        return crc_ok
+
+    def _op_mem_read_into(self, addr, size, out):
+        start = self._stats.begin()
+        yield ('write', _cmd_addr_u32.pack(COMMANDS.index('mem_read'), addr,
+                                           size))
+        local_crc32 = yield from self._op_read(size, out)
+        if local_crc32 is None:
+            self._stats.end('mem_read', start, False)
+            return False
+        response = yield ('read', u32.size, 0)
+        crc_ok = (len(response) == u32.size and
+                  u32.unpack(response)[0] == local_crc32)
+        self._stats.end('mem_read', start, crc_ok)
+        return crc_ok
+
+    def _op_read(self, size, out):
+        blocksize = self.block_size
+        blocks = (size + blocksize - 1) // blocksize
+
+        try:
+            view = memoryview(out).cast('B')
+            sink = None
+            if len(view) < size:
+                raise ValueError('Buffer is smaller than the read size')
+        except TypeError:
+            view = memoryview(bytearray(min(size, blocksize)))
+            sink = out
+
+        crc = 0
+        offset = 0
+        progress = Log.progress('Receiving %(size)d bytes', size, size=size)
+        with progress:
+            for block in range(blocks):
+                n = min(blocksize, size - offset)
+                if sink is None:
+                    chunk = view[offset:offset+n]
+                else:
+                    chunk = view[:n]
+                if (yield ('readinto', chunk)) != n:
+                    return None
+                crc = crc32(chunk, crc)
+                if sink is not None:
+                    sink.write(chunk)
+                offset += n
+                progress.advance(n)
+
+        return crc & 0xFFFFFFFF
+
+    def _op_mem_crc(self, addr, size, block_size):
+        if not block_size:
+            block_size = max(size, 1)
+        blocks = (size + block_size - 1) // block_size if size else 0
+
+        start = self._stats.begin()
+        yield ('write', _cmd_mem_crc.pack(COMMANDS.index('mem_crc'), addr,
+                                          size, block_size))
+        # each crc is only sent once its whole block is summed
+        response = yield ('read', blocks * u32.size,
+                          min(size, block_size) * _crc_byte_time)
+        ok = len(response) == blocks * u32.size
+        self._stats.end('mem_crc', start, ok)
+        if not ok:
+            return None
+        return list(Struct('<%dL' % blocks).unpack(response))
+
+
+class Core(_Commands):
     """python interface to the core, the base code running on the target"""
+
     def __init__(self, target):
         self._target = target
+        self._stats = Stats(target)
+
+        stats_file = Config.get('general.stats_file')
+        if stats_file:
+            self._stats.dump_at_exit(stats_file)
+
+        # the loader may already have checked it while testing the link
+        if not self._target.signature_checked:
+            if self._target.read_u32() != 0x4e4f4d75:
+                raise Exception('Micromon signature invalid/missing')
+            self._target.signature_checked = True
+            sleep(0.1)
+
+    def _drive(self, op):
+        result = None
+        try:
+            while True:
+                request = op.send(result)
+                kind = request[0]
+                if kind == 'write':
+                    result = self._target.write(request[1])
+                elif kind == 'send':
+                    result = self._write(request[1])
+                elif kind == 'read':
+                    result = self._read_response(request[1], request[2])
+                elif kind == 'readinto':
+                    result = self._target.readinto(request[1])
+                else:
+                    result = request[1](*request[2:])
+        except StopIteration as stop:
+            return stop.value
+
+    def batch(self):
+        """queue reads and writes, sending them all in a single round trip
 
-        if self._target.read_u32() != 0x4e4f4d75:
-            raise Exception('Micromon signature invalid/missing')
-        sleep(0.1)
+        with core.batch() as b:
+            b.write_u32(addr, value)
+            status = b.read_u32(addr)
+        print(status.result())
+        """
+        return Batch(self)
 
     def write_u8(self, addr, data):
-        self._target.write_u8(COMMANDS.index('write_u8'))
-        self._target.write_u32(addr)
-        self._target.write_u8(data)
+        self._drive(self._op_write('write_u8', _cmd_addr_u8, addr, data))
 
     def write_u16(self, addr, data):
-        self._target.write_u8(COMMANDS.index('write_u16'))
-        self._target.write_u32(addr)
-        self._target.write_u16(data)
+        self._drive(self._op_write('write_u16', _cmd_addr_u16, addr, data))
 
     def write_u32(self, addr, data):
-        self._target.write_u8(COMMANDS.index('write_u32'))
-        self._target.write_u32(addr)
-        self._target.write_u32(data)
+        self._drive(self._op_write('write_u32', _cmd_addr_u32, addr, data))
+
+    def rmw(self, addr, width, and_mask=0xFFFFFFFF, or_mask=0, xor_mask=0):
+        """have the target replace the width bit value at addr with
+        ((value & and_mask) | or_mask) ^ xor_mask in one command, without
+        a round trip"""
+        self._drive(self._op_rmw(addr, width, and_mask, or_mask, xor_mask))
 
     def read_u8(self, addr):
-        self._target.write_u8(COMMANDS.index('read_u8'))
-        self._target.write_u32(addr)
-        return self._target.read_u8()
+        return self._drive(self._op_read_struct('read_u8', addr, u8))
 
     def read_u16(self, addr):
-        self._target.write_u8(COMMANDS.index('read_u16'))
-        self._target.write_u32(addr)
-        return self._target.read_u16()
+        return self._drive(self._op_read_struct('read_u16', addr, u16))
 
     def read_u32(self, addr):
-        self._target.write_u8(COMMANDS.index('read_u32'))
-        self._target.write_u32(addr)
-        return self._target.read_u32()
-
-    def mem_write(self, addr, data):
-        self._target.write_u8(COMMANDS.index('mem_write'))
-        self._target.write_u32(addr)
-        self._target.write_u32(len(data))
-        self._write(data)
-        remote_crc32 = self._target.read_u32()
-        local_crc32 = crc32(data) & 0xFFFFFFFF
-        crc_ok = (remote_crc32 == local_crc32)
-        return crc_ok
+        return self._drive(self._op_read_struct('read_u32', addr, u32))
+
+    def poll(self, addr, mask, value, timeout_us=100000, width=32):
+        """have the target read the width bit word at addr until its mask
+        bits equal value or about timeout_us passes.  Returns the last
+        value read and the number of reads, or (None, 0) if the target did
+        not answer.  Compare the value against mask and value to tell a
+        match from a timeout."""
+        return self._drive(self._op_poll(addr, mask, value, timeout_us,
+                                         width))
+
+    def adc_capture(self, addr, channels, rounds, timeout=None):
+        """have the target run rounds of conversions over the channels in
+        the channels bit mask and store them as u16 samples at addr, see
+        adc.py.  Returns the number of samples stored and the seconds
+        between sending the command and its answer, or (None, elapsed) if
+        it never came.  timeout is how long the capture may take on top of
+        the data timeout."""
+        return self._drive(self._op_adc_capture(addr, channels, rounds,
+                                                timeout))
+
+    def mem_fill(self, addr, size, pattern=0, width=8):
+        """fill size bytes at addr with the width bit pattern, repeated
+        from addr on, returns True if the crc of the result matches"""
+        return self._drive(self._op_mem_fill(addr, size, pattern, width))
+
+    def _read_response(self, size, wait):
+        """read a response that the target may take up to wait seconds
+        longer than usual to send"""
+        data_timeout = self._target.timeout
+        if wait > data_timeout / 2:
+            self._target.timeout = data_timeout + wait
+        try:
+            return self._target.read(size)
+        finally:
+            self._target.timeout = data_timeout
+
+    def mem_write(self, addr, data, compress=None, resume=False):
+        """write data to target memory, returns True if the crc matches.
+
+        With compress=True the data is sent LZ4 compressed and unpacked by
+        the target.  By default compression is used when it is estimated
+        to finish sooner at the current baudrate.
+
+        With resume=True the upload is journaled block by block.  If an
+        earlier upload of the same image to the same address was cut
+        short, the blocks it completed are checked with mem_crc and the
+        upload continues from the first one that no longer matches.
+
+        Long runs of a repeated byte, halfword or word are sent as mem_fill
+        and the data between them as above."""
+        return self._drive(self._op_mem_write(addr, data, compress, resume))
 
     def mem_read(self, addr, size):
-        self._target.write_u8(COMMANDS.index('mem_read'))
-        self._target.write_u32(addr)
-        self._target.write_u32(size)
-        data = self._read(size)
-        remote_crc32 = self._target.read_u32()
-        local_crc32 = crc32(data) & 0xFFFFFFFF
-        crc_ok = (remote_crc32 == local_crc32)
+        data = bytearray(size)
+        crc_ok = self.mem_read_into(addr, size, data)
         return (data, crc_ok)
 
+    def mem_read_into(self, addr, size, out):
+        """read target memory directly into out, which is either a writable
+        buffer (bytearray, memoryview, mmap) of at least size bytes or a
+        binary file.  The crc is updated as each block arrives, returns
+        True if it matches the target's."""
+        return self._drive(self._op_mem_read_into(addr, size, out))
+
+    def mem_crc(self, addr, size, block_size=None):
+        """crc32 of each block_size block of target memory, the last block
+        may be short.  Returns a list, or None if the target stopped
+        responding."""
+        return self._drive(self._op_mem_crc(addr, size, block_size))
+
+    def mem_sync(self, addr, data, block_size=4096):
+        """upload only the blocks of data that differ from what the target
+        already holds at addr, then verify the whole range"""
+        size = len(data)
+        view = memoryview(data)
+        local = [crc32(view[offset:offset+block_size]) & 0xFFFFFFFF
+                 for offset in range(0, size, block_size)]
+
+        remote = self.mem_crc(addr, size, block_size)
+        if remote is None:
+            return False
+
+        stale = [block for block, crc in enumerate(remote)
+                 if crc != local[block]]
+        with Log.info('Syncing %(stale)d of %(blocks)d block(s)',
+                      stale=len(stale), blocks=len(local)):
+            for first, last in _runs(stale):
+                offset = first * block_size
+                end = (last + 1) * block_size
+                if not self.mem_write(addr + offset, view[offset:end]):
+                    return False
+
+        return self.mem_crc(addr, size, block_size) == local
+
+    def verify(self, addr, data, fanout=16):
+        """compare target memory at addr with data without reading it
+        back.  The crc of the whole range is checked first, a mismatching
+        range is split into fanout blocks whose crcs are compared in turn,
+        and blocks small enough that their crcs would cost as much as the
+        data are read and compared byte for byte.  Returns the differing
+        target address ranges as sorted, merged (start, end) pairs, empty
+        if the memory matches."""
+        if fanout < 2:
+            raise ValueError('Fanout must be at least 2')
+        view = memoryview(data).cast('B')
+        size = len(view)
+        if not size:
+            return []
+
+        remote = self.mem_crc(addr, size)
+        if remote is None:
+            raise Exception('Verify crc failed')
+        if remote[0] == crc32(view) & 0xFFFFFFFF:
+            return []
+
+        leaf_size = fanout * u32.size
+        differ = []
+        ranges = [(0, size)]
+        while ranges:
+            next_ranges = []
+            for start, end in ranges:
+                if end - start <= leaf_size:
+                    remote, crc_ok = self.mem_read(addr + start, end - start)
+                    if not crc_ok:
+                        raise Exception('Verify read failed')
+                    differ += _diff(view[start:end], remote, addr + start)
+                    continue
+
+                block_size = (end - start + fanout - 1) // fanout
+                remote = self.mem_crc(addr + start, end - start, block_size)
+                if remote is None:
+                    raise Exception('Verify crc failed')
+                for n, crc in enumerate(remote):
+                    offset = start + n * block_size
+                    block_end = min(offset + block_size, end)
+                    if crc32(view[offset:block_end]) & 0xFFFFFFFF != crc:
+                        next_ranges.append((offset, block_end))
+            ranges = next_ranges
+        return _merge(differ)
+
+    def mem_write_reliable(self, addr, data, block_size=1024, window=8,
+                           retries=16, timeout=None):
+        """write data as numbered blocks that each carry a crc.  Up to
+        window blocks are in flight at once, the target acknowledges every
+        block and only the ones it rejects or never answers are resent.
+        The result is checked with mem_crc and any block that still
+        differs is sent again.  Gives up with False once timeout seconds
+        have passed, by default a few times the time the data takes on
+        the wire."""
+        if not 0 < block_size <= MAX_BLOCK_SIZE:
+            raise ValueError('Invalid block size')
+        view = memoryview(data).cast('B')
+        size = len(view)
+        deadline = self._blocks_deadline(size, timeout)
+        local = [crc32(view[offset:offset+block_size]) & 0xFFFFFFFF
+                 for offset in range(0, size, block_size)]
+        stale = list(range(len(local)))
+        for _ in range(retries):
+            if perf_counter() > deadline:
+                return False
+            if stale:
+                start = self._stats.begin()
+                try:
+                    ok = self._write_blocks(addr, view, block_size, stale,
+                                            window, retries, deadline)
+                finally:
+                    self._stats.end('mem_write_blocks', start)
+                if not ok:
+                    return False
+
+            remote = self.mem_crc(addr, size, block_size)
+            if remote is None:
+                # check again without resending anything
+                self._target.purge_input()
+                stale = []
+                continue
+            stale = [block for block, crc in enumerate(local)
+                     if block >= len(remote) or remote[block] != crc]
+            if not stale:
+                return True
+            self._stats.crc_failure('mem_write_blocks', len(stale))
+        return False
+
+    def _blocks_deadline(self, size, timeout):
+        if timeout is None:
+            timeout = (_blocks_min_timeout +
+                       _blocks_wire_factor * size * 10.0 /
+                       self._target.baudrate)
+        return perf_counter() + timeout
+
+    def _write_blocks(self, addr, view, block_size, blocks, window, retries,
+                      deadline):
+        size = len(view)
+        for _ in range(retries):
+            if self._open_blocks('mem_write_blocks', addr, size, block_size):
+                break
+            if perf_counter() > deadline:
+                return False
+        else:
+            return False
+
+        pending = deque(blocks)
+        in_flight = set()
+        done = set()
+        attempts = {}
+        total = sum(min(block_size, size - seq * block_size)
+                    for seq in blocks)
+        progress = Log.progress('Sending %(size)d bytes', total, size=total)
+        with progress:
+            while len(done) < len(blocks):
+                if perf_counter() > deadline:
+                    self._abort_blocks(block_size, retries)
+                    return False
+                while pending and len(in_flight) < window:
+                    seq = pending.popleft()
+                    if seq in done or seq in in_flight:
+                        continue
+                    attempts[seq] = attempts.get(seq, 0) + 1
+                    if attempts[seq] > retries:
+                        self._abort_blocks(block_size, retries)
+                        return False
+                    offset = seq * block_size
+                    self._send_block(seq, view[offset:offset+block_size])
+                    in_flight.add(seq)
+
+                status, seq = self._read_status()
+                if status == BLOCK_ACK and seq in in_flight:
+                    in_flight.discard(seq)
+                    done.add(seq)
+                    progress.advance(min(block_size, size - seq * block_size))
+                elif status == BLOCK_NAK and seq in in_flight:
+                    in_flight.discard(seq)
+                    pending.appendleft(seq)
+                    self._stats.crc_failure('mem_write_blocks')
+                elif status is None:
+                    # timed out or damaged, resend everything not yet
+                    # acknowledged
+                    self._target.purge_input()
+                    pending.extendleft(sorted(in_flight, reverse=True))
+                    in_flight.clear()
+
+        return self._close_blocks(block_size, retries)
+
+    def _close_blocks(self, block_size, retries):
+        """end a mem_write_blocks transfer, returns whether the target
+        acknowledged the end"""
+        for attempt in range(retries):
+            if self._end_blocks(block_size if attempt else 0):
+                return True
+        return False
+
+    def _abort_blocks(self, block_size, retries):
+        """end a mem_write_blocks transfer that is given up on, the
+        statuses of blocks still in flight are dropped.  A target that
+        does not leave the transfer would take the next commands as block
+        data, so that raises."""
+        if not self._close_blocks(block_size, retries):
+            raise Exception('Target did not end the block transfer')
+        self._drain(0)
+
+    def _drain(self, size):
+        """drop input until the line is quiet, allowing for size more
+        bytes of a transfer that was given up on.  Raises if it does not
+        go quiet in that time."""
+        until = (perf_counter() + _blocks_drain_time +
+                 size * 10.0 / self._target.baudrate)
+        while self._target.read(MAX_BLOCK_SIZE):
+            if perf_counter() > until:
+                raise Exception('Target did not end the block transfer')
+
+    def _open_blocks(self, command, addr, size, block_size):
+        """send the header of mem_write_blocks or mem_read_blocks and
+        return whether the target accepted it"""
+        header = _blocks_header.pack(addr, size, block_size)
+        self._target.write(u8.pack(COMMANDS.index(command)) + header +
+                           u32.pack(crc32(header) & 0xFFFFFFFF))
+        status, seq = self._read_status()
+        if status == BLOCK_ACK and seq == BLOCK_START:
+            return True
+        if status is None:
+            # the target may have taken the header after all, the end
+            # frame closes a write and is ignored as commands, and the
+            # data of a read has to run out
+            self._send_block(BLOCK_END, b'')
+            self._drain(size if command == 'mem_read_blocks' else 0)
+        self._target.purge_input()
+        return False
+
+    def _end_blocks(self, padding):
+        """send BLOCK_END, returns whether the target acknowledged it.  A
+        damaged sequence number can leave the target waiting for more
+        payload than was sent, padding bytes ahead of the frame make up
+        for that and are skipped otherwise."""
+        self._target.write(bytes(padding))
+        self._send_block(BLOCK_END, b'')
+        while True:
+            status, seq = self._read_status()
+            if status == BLOCK_ACK and seq == BLOCK_END:
+                return True
+            if status is None:
+                break
+            if status == BLOCK_NAK:
+                self._stats.crc_failure('mem_write_blocks')
+        self._target.purge_input()
+        return False
+
+    def _send_block(self, seq, payload):
+        header = _block_header.pack(BLOCK_SYNC, seq)
+        crc = crc32(payload, crc32(header[4:])) & 0xFFFFFFFF
+        self._target.write(header + payload + u32.pack(crc))
+
+    def _read_status(self):
+        """(status, seq) of a status frame, or (None, None) if none came or
+        its crc does not match"""
+        response = self._target.read(_block_status.size)
+        if len(response) != _block_status.size:
+            return (None, None)
+        status, seq, crc = _block_status.unpack(response)
+        if crc32(response[:-u32.size]) & 0xFFFFFFFF != crc:
+            return (None, None)
+        return (status, seq)
+
+    def mem_read_reliable(self, addr, size, block_size=1024, retries=16,
+                          timeout=None):
+        """read target memory with a crc per block, rereading only the
+        blocks that arrive damaged.  Gives up once timeout seconds have
+        passed, like mem_write_reliable.  Returns (data, ok)."""
+        if not 0 < block_size <= MAX_BLOCK_SIZE:
+            raise ValueError('Invalid block size')
+        data = bytearray(size)
+        view = memoryview(data)
+        deadline = self._blocks_deadline(size, timeout)
+        blocks = (size + block_size - 1) // block_size
+        bad = list(range(blocks))
+        for _ in range(retries):
+            runs = _runs(bad)
+            bad = []
+            for first, last in runs:
+                if perf_counter() > deadline:
+                    return (data, False)
+                offset = first * block_size
+                end = min((last + 1) * block_size, size)
+                bad += self._read_blocks(addr + offset, view[offset:end],
+                                         block_size, first)
+            if not bad:
+                return (data, True)
+            self._target.purge_input()
+        return (data, False)
+
+    def _read_blocks(self, addr, view, block_size, first):
+        start = self._stats.begin()
+        bad = self._read_block_run(addr, view, block_size, first)
+        self._stats.end('mem_read_blocks', start)
+        self._stats.crc_failure('mem_read_blocks', len(bad))
+        return bad
+
+    def _read_block_run(self, addr, view, block_size, first):
+        size = len(view)
+        blocks = list(range(first, first + (size + block_size - 1) //
+                            block_size))
+        if not self._open_blocks('mem_read_blocks', addr, size, block_size):
+            return blocks
+        crc = bytearray(u32.size)
+        bad = []
+        for offset in range(0, size, block_size):
+            chunk = view[offset:offset+block_size]
+            block = first + offset // block_size
+            if (self._target.readinto(chunk) != len(chunk) or
+                    self._target.readinto(crc) != len(crc)):
+                # lost bytes shift the rest of the run, it is read again
+                self._drain(size - offset)
+                return bad + blocks[block - first:]
+            if crc32(chunk) & 0xFFFFFFFF != u32.unpack(crc)[0]:
+                bad.append(block)
+        return bad
+
     def run(self, exec_at):
-        self._target.write_u8(COMMANDS.index('run'))
-        self._target.write_u32(exec_at)
+        self._drive(self._op_write('run', _cmd_addr, exec_at))
 
     def run_kernel(self, exec_at, machine_type):
-        self._target.write_u8(COMMANDS.index('run_kernel'))
-        self._target.write_u32(exec_at)
-        self._target.write_u32(machine_type)
+        self._drive(self._op_write('run_kernel', _cmd_addr_u32, exec_at,
+                                   machine_type))
 
     def _write(self, data):
         size = len(data)
-        blocksize = 512
-        blocks = (size + blocksize - 1) / blocksize
-        block = 0
-
-        log_entry = Log.info('Sending block %(block)d of %(blocks)d block(s)',
-                             block=block, blocks=blocks)
-        with log_entry:
-            while block + 1 < blocks:
-                log_entry.update(block=block + 1)
-                offset = block * blocksize
-                self._target.write(data[offset:offset+blocksize])
-                block += 1
-
-    def _read(self, size):
-        data = ''
-        blocksize = 512
-        blocks = (size + blocksize - 1) / blocksize
-        block = 0
-
-        log_entry = Log.info('Receiving block %(block)d of %(blocks)d block(s)',
-                             block=block, blocks=blocks)
-        with log_entry:
-            while block + 1 < blocks:
-                log_entry.update(block=block + 1)
-                offset = block * blocksize
-                data_block = self._target.read(blocksize)
-                if not data_block:
-                    return None
-                data += data_block
-                block += 1
-
+        progress = Log.progress('Sending %(size)d bytes', size, size=size)
+        with progress:
+            for n in self._target.write_blocks(data):
+                progress.advance(n)
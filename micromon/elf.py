@@ -0,0 +1,148 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""loading of 32 bit little endian ARM ELF executables
+
+Only the PT_LOAD segments are loaded, each to its physical address, and
+the entry point moves along with the segment holding it.  The file is
+mapped rather than read, and only the bytes backed by the file are sent,
+the rest of a segment (.bss) is zeroed with mem_fill.
+"""
+
+from .log import Log
+from binascii import crc32
+from collections import namedtuple
+from struct import Struct
+import mmap
+
+ELF_MAGIC = b'\x7fELF'
+
+_EM_ARM = 40
+_PT_LOAD = 1
+
+_ehdr = Struct('<16sHHLLLLLHHHHHH')
+_phdr = Struct('<LLLLLLLL')
+
+Segment = namedtuple('Segment', ('vaddr', 'paddr', 'offset', 'filesz',
+                                 'memsz'))
+
+def is_elf(filename):
+    with open(filename, 'rb') as fp:
+        return fp.read(len(ELF_MAGIC)) == ELF_MAGIC
+
+def _zero_crc32(size, crc):
+    zeros = bytes(min(size, 65536))
+    while size:
+        n = min(size, len(zeros))
+        crc = crc32(zeros[:n], crc)
+        size -= n
+    return crc & 0xFFFFFFFF
+
+class ElfImage:
+    def __init__(self, filename):
+        self._fp = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fp.close()
+            raise Exception('ELF file is empty')
+        self._views = []
+        try:
+            self._parse()
+        except:
+            self.close()
+            raise
+
+    def _parse(self):
+        m = self._map
+        if len(m) < _ehdr.size or m[:4] != ELF_MAGIC:
+            raise Exception('Not an ELF file')
+        (ident, _, machine, _, entry, phoff, _, _, _, phentsize,
+         phnum, _, _, _) = _ehdr.unpack_from(m)
+        if ident[4] != 1 or ident[5] != 1 or machine != _EM_ARM:
+            raise Exception('Not a 32 bit little endian ARM ELF file')
+        if phentsize < _phdr.size or phoff + phnum * phentsize > len(m):
+            raise Exception('ELF program headers are truncated')
+
+        self.segments = []
+        for i in range(phnum):
+            (type, offset, vaddr, paddr, filesz, memsz, _, _) = \
+                _phdr.unpack_from(m, phoff + i * phentsize)
+            if type != _PT_LOAD or not memsz:
+                continue
+            if offset + filesz > len(m) or filesz > memsz:
+                raise Exception('ELF segment at 0x%08X is truncated' % paddr)
+            self.segments.append(Segment(vaddr, paddr, offset, filesz,
+                                         memsz))
+
+        # e_entry is a virtual address, the core runs with the MMU off
+        for segment in self.segments:
+            if segment.vaddr <= entry < segment.vaddr + segment.memsz:
+                self.entry = entry - segment.vaddr + segment.paddr
+                break
+        else:
+            raise Exception('ELF entry point 0x%08X is not in a loaded '
+                            'segment' % entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self.close()
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._map.close()
+        self._fp.close()
+
+    def data(self, segment):
+        """the file backed bytes of segment as a memoryview of the mapping"""
+        view = memoryview(self._map)[segment.offset:
+                                     segment.offset + segment.filesz]
+        self._views.append(view)
+        return view
+
+    def load(self, core, resume=False):
+        """upload every segment, zero their tails and verify them all,
+        returns True if every crc matches"""
+        for segment in self.segments:
+            Log.info('Segment at 0x%(addr)08X, %(filesz)d of %(memsz)d '
+                     'bytes from file', addr=segment.paddr,
+                     filesz=segment.filesz, memsz=segment.memsz).single()
+            if segment.filesz and not core.mem_write(
+                    segment.paddr, self.data(segment), resume=resume):
+                return False
+            tail = segment.memsz - segment.filesz
+            if tail and not core.mem_fill(segment.paddr + segment.filesz,
+                                          tail, 0):
+                return False
+        return self.verify(core)
+
+    def verify(self, core):
+        """check every segment with a crc computed on the target, a later
+        segment may have overwritten an earlier one"""
+        for segment in self.segments:
+            local_crc32 = _zero_crc32(segment.memsz - segment.filesz,
+                                      crc32(self.data(segment)))
+            remote = core.mem_crc(segment.paddr, segment.memsz)
+            if not remote or remote[0] != local_crc32:
+                Log.error('Segment at 0x%(addr)08X does not match',
+                          addr=segment.paddr).single()
+                return False
+        return True
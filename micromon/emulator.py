@@ -0,0 +1,417 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""software stand-in for a POLLUX board running micromon
+
+The emulator answers the boot ROM UART handshake and the first stage
+loader's baudrate switch, then serves the main.c command set from a
+sparse memory.  It talks over a pty, which Target opens like any serial
+port, or over any connected file descriptor such as one end of a
+socketpair.
+"""
+
+import os
+import random
+import threading
+import tty
+from binascii import crc32
+from struct import Struct
+from time import perf_counter, sleep
+
+from .core import (BLOCK_ACK, BLOCK_END, BLOCK_NAK, BLOCK_START, BLOCK_SYNC,
+                   COMMANDS, MAX_BLOCK_SIZE)
+from .loader import BAUDRATES
+
+u8 = Struct('<B')
+u16 = Struct('<H')
+u32 = Struct('<L')
+
+_SIGNATURE = 0x4e4f4d75
+_PAGE_SHIFT = 16
+_PAGE_SIZE = 1 << _PAGE_SHIFT
+_ADCDAT = 0xC0005004
+
+class Memory:
+    """sparse 32-bit address space, unwritten memory reads as zero"""
+    def __init__(self):
+        self._pages = {}
+
+    def _page(self, n):
+        page = self._pages.get(n)
+        if page is None:
+            page = self._pages[n] = bytearray(_PAGE_SIZE)
+        return page
+
+    def read(self, addr, size):
+        data = bytearray()
+        while size > 0:
+            offset = addr & (_PAGE_SIZE - 1)
+            n = min(size, _PAGE_SIZE - offset)
+            page = self._pages.get(addr >> _PAGE_SHIFT)
+            data += page[offset:offset+n] if page else bytes(n)
+            addr += n
+            size -= n
+        return data
+
+    def write(self, addr, data):
+        view = memoryview(data).cast('B')
+        while view:
+            offset = addr & (_PAGE_SIZE - 1)
+            n = min(len(view), _PAGE_SIZE - offset)
+            self._page(addr >> _PAGE_SHIFT)[offset:offset+n] = view[:n]
+            addr += n
+            view = view[n:]
+
+
+class Emulator:
+    """emulated target, see the module docstring.
+
+    boot_size is the boot ROM mode: '512' or '16k'.  With throttle the
+    byte rate in each direction is limited to the current baudrate, and
+    latency seconds are added before every response to mimic USB serial
+    adapters.  Once booted, each byte in either direction is corrupted
+    with probability error_rate."""
+    def __init__(self, boot_size='512', throttle=True, latency=0.0,
+                 error_rate=0.0):
+        if boot_size not in ('512', '16k'):
+            raise ValueError('boot_size must be 512 or 16k')
+        self.boot_size = boot_size
+        self.throttle = throttle
+        self.latency = latency
+        self.error_rate = error_rate
+        self.memory = Memory()
+        self.baudrate = 19200
+        self.executed = None
+        self._fd = None
+        self._rx_clock = 0.0
+        self._tx_clock = 0.0
+        self._baudinfo = {v: k for k, v in BAUDRATES.items()}
+        self._booted = False
+
+    def open_pty(self):
+        """create a pty, serve it from a daemon thread and return the path
+        to pass to Target"""
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        path = os.ttyname(slave)
+        # keep the slave open so the master survives the host reopening it
+        self._slave = slave
+        thread = threading.Thread(target=self.serve, args=(master,),
+                                  daemon=True)
+        thread.start()
+        return path
+
+    def serve(self, fd):
+        """run boot and command sessions on fd until it is closed"""
+        self._fd = fd
+        try:
+            while True:
+                self._boot()
+                self._command_loop()
+        except EOFError:
+            pass
+
+    def _wire_time(self, clock, size):
+        if not self.throttle:
+            return clock
+        # allow catching up on a little time lost to scheduling
+        now = perf_counter()
+        clock = max(clock, now - 0.01) + size * 10.0 / self.baudrate
+        if clock > now:
+            sleep(clock - now)
+        return clock
+
+    def _recv(self, size):
+        data = bytearray()
+        while len(data) < size:
+            n = size - len(data)
+            if self.throttle:
+                # take about a millisecond of data at a time so the host
+                # is held back by the pty buffer instead of racing ahead
+                n = min(n, max(16, self.baudrate // 10000))
+            try:
+                chunk = os.read(self._fd, n)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                raise EOFError
+            data += chunk
+            self._rx_clock = self._wire_time(self._rx_clock, len(chunk))
+        return self._corrupt(data)
+
+    def _corrupt(self, data):
+        if self._booted and self.error_rate:
+            data = bytearray(data)
+            for i in range(len(data)):
+                if random.random() < self.error_rate:
+                    data[i] ^= 1 << random.randrange(8)
+        return data
+
+    def _send(self, data):
+        if self.latency:
+            sleep(self.latency)
+        view = memoryview(self._corrupt(data))
+        while view:
+            n = len(view)
+            if self.throttle:
+                n = min(n, max(16, self.baudrate // 10000))
+            self._tx_clock = self._wire_time(self._tx_clock, n)
+            n = os.write(self._fd, view[:n])
+            view = view[n:]
+
+    def _recv_struct(self, t):
+        return t.unpack(self._recv(t.size))[0]
+
+    def _boot(self):
+        self.baudrate = 19200
+        self._booted = False
+
+        # boot ROM, answered by the first stage once it is loaded
+        stage = 512 if self.boot_size == '512' else 16384
+        self._recv(stage)
+        self._send(b'UART')
+
+        baudinfo = self._recv_struct(u32)
+        baudrate = self._baudinfo.get(baudinfo)
+        self._send(u8.pack(1 if baudrate else 0))
+        if baudrate:
+            self.baudrate = baudrate
+        self._send(u8.pack(1 if self._recv_struct(u16) == 0xAA55 else 0))
+
+        size = self._recv_struct(u32)
+        self._recv(size)
+        self._send(u8.pack(0x5A))
+        self._recv_struct(u8)
+        self.executed = None
+        self._send(u32.pack(_SIGNATURE))
+        self._booted = True
+
+    def _command_loop(self):
+        while self.executed is None:
+            command = self._recv_struct(u8)
+            if command >= len(COMMANDS):
+                continue
+            getattr(self, 'cmd_' + COMMANDS[command])()
+
+    def cmd_nop(self):
+        pass
+
+    def cmd_write_u8(self):
+        addr = self._recv_struct(u32)
+        self.memory.write(addr, self._recv(1))
+
+    def cmd_write_u16(self):
+        addr = self._recv_struct(u32)
+        self.memory.write(addr, self._recv(2))
+
+    def cmd_write_u32(self):
+        addr = self._recv_struct(u32)
+        self.memory.write(addr, self._recv(4))
+
+    def cmd_read_u8(self):
+        self._send(self.memory.read(self._recv_struct(u32), 1))
+
+    def cmd_read_u16(self):
+        self._send(self.memory.read(self._recv_struct(u32), 2))
+
+    def cmd_read_u32(self):
+        self._send(self.memory.read(self._recv_struct(u32), 4))
+
+    def cmd_mem_write(self):
+        addr = self._recv_struct(u32)
+        size = self._recv_struct(u32)
+        data = self._recv(size)
+        self.memory.write(addr, data)
+        self._send(u32.pack(crc32(data)))
+
+    def cmd_mem_read(self):
+        addr = self._recv_struct(u32)
+        size = self._recv_struct(u32)
+        data = self.memory.read(addr, size)
+        self._send(data + u32.pack(crc32(data)))
+
+    def cmd_run(self):
+        self.executed = (self._recv_struct(u32), None)
+
+    def cmd_run_kernel(self):
+        exec_at = self._recv_struct(u32)
+        self.executed = (exec_at, self._recv_struct(u32))
+
+    def cmd_mem_write_lz(self):
+        addr = self._recv_struct(u32)
+        size = self._recv_struct(u32)
+        src = self._recv_struct(u32)
+        packed_size = self._recv_struct(u32)
+        self.memory.write(src, self._recv(packed_size))
+
+        # decode in place over a copy of the affected range, like main.c
+        lo = min(addr, src)
+        buf = self.memory.read(lo, max(addr + size, src + packed_size) - lo)
+        p = addr - lo
+        end = p + size
+        src = src - lo
+        src_end = src + packed_size
+
+        def length(n):
+            nonlocal src
+            if n == 15:
+                while True:
+                    b = buf[src]
+                    src += 1
+                    n += b
+                    if b != 255:
+                        break
+            return n
+
+        while src < src_end:
+            token = buf[src]
+            src += 1
+            n = min(length(token >> 4), end - p)
+            buf[p:p+n] = buf[src:src+n]
+            src += n
+            p += n
+            if src >= src_end:
+                break
+            offset = buf[src] | (buf[src + 1] << 8)
+            src += 2
+            n = min(length(token & 15) + 4, end - p)
+            while n > 0:
+                chunk = buf[p-offset:p-offset+min(offset, n)]
+                buf[p:p+len(chunk)] = chunk
+                p += len(chunk)
+                n -= len(chunk)
+
+        self.memory.write(lo, buf)
+        size = p - (addr - lo)
+        self._send(u32.pack(size) +
+                   u32.pack(crc32(buf[addr-lo:addr-lo+size])))
+
+    def cmd_mem_crc(self):
+        addr = self._recv_struct(u32)
+        size = self._recv_struct(u32)
+        block_size = self._recv_struct(u32) or size
+        response = bytearray()
+        for offset in range(0, size, block_size):
+            n = min(block_size, size - offset)
+            response += u32.pack(crc32(self.memory.read(addr + offset, n)))
+        self._send(response)
+
+    def cmd_mem_poll(self):
+        addr = self._recv_struct(u32)
+        width = self._recv_struct(u8)
+        mask = self._recv_struct(u32)
+        value = self._recv_struct(u32)
+        timeout_us = self._recv_struct(u32)
+        n = {8: u8, 16: u16}.get(width, u32)
+        n = n.unpack(self.memory.read(addr, n.size))[0]
+        iterations = 1
+        if n & mask != value:
+            # nothing changes memory behind the host's back, this would
+            # spin until the timeout, see POLL_LOOPS_PER_US in main.c
+            sleep(timeout_us / 1e6)
+            iterations = max(1, timeout_us * 8)
+        self._send(u32.pack(n) + u32.pack(iterations & 0xFFFFFFFF))
+
+    def cmd_adc_capture(self):
+        addr = self._recv_struct(u32)
+        channels = self._recv_struct(u8)
+        rounds = self._recv_struct(u32)
+        # conversions finish at once and read back whatever ADCDAT holds
+        sample = u16.unpack(self.memory.read(_ADCDAT, 2))[0] & 0x3FF
+        count = rounds * bin(channels).count('1')
+        self.memory.write(addr, u16.pack(sample) * count)
+        self._send(u32.pack(count))
+
+    def cmd_mem_fill(self):
+        addr = self._recv_struct(u32)
+        size = self._recv_struct(u32)
+        pattern = self._recv_struct(u32)
+        width = self._recv_struct(u8)
+        if width == 8:
+            pattern = (pattern & 0xFF) * 0x01010101
+        elif width == 16:
+            pattern = (pattern & 0xFFFF) * 0x00010001
+        data = (u32.pack(pattern) * (size // 4 + 1))[:size]
+        self.memory.write(addr, data)
+        self._send(u32.pack(crc32(data)))
+
+    def cmd_rmw(self):
+        addr = self._recv_struct(u32)
+        width = self._recv_struct(u8)
+        and_mask = self._recv_struct(u32)
+        or_mask = self._recv_struct(u32)
+        xor_mask = self._recv_struct(u32)
+        t = {8: u8, 16: u16}.get(width, u32)
+        value = t.unpack(self.memory.read(addr, t.size))[0]
+        value = ((value & and_mask) | or_mask) ^ xor_mask
+        self.memory.write(addr, t.pack(value & ((1 << t.size * 8) - 1)))
+
+    def _block_status(self, status, seq):
+        frame = u8.pack(status) + u32.pack(seq)
+        self._send(frame + u32.pack(crc32(frame)))
+
+    def _blocks_header(self):
+        header = self._recv(12)
+        addr, size, block_size = Struct('<LLL').unpack(header)
+        if (self._recv_struct(u32) != crc32(header) or
+                not 0 < block_size <= MAX_BLOCK_SIZE):
+            self._block_status(BLOCK_NAK, BLOCK_START)
+            return None
+        self._block_status(BLOCK_ACK, BLOCK_START)
+        return (addr, size, block_size)
+
+    def cmd_mem_write_blocks(self):
+        header = self._blocks_header()
+        if header is None:
+            return
+        addr, size, block_size = header
+
+        while True:
+            sync = 0
+            while sync != BLOCK_SYNC:
+                sync = (sync >> 8) | (self._recv(1)[0] << 24)
+
+            header = self._recv(4)
+            seq = u32.unpack(header)[0]
+            if seq == BLOCK_END:
+                n = 0
+            elif seq >= 0x100000 or seq * block_size >= size:
+                self._block_status(BLOCK_NAK, seq)
+                continue
+            else:
+                n = min(block_size, size - seq * block_size)
+
+            payload = self._recv(n)
+            crc = self._recv_struct(u32)
+            if crc != crc32(payload, crc32(header)):
+                self._block_status(BLOCK_NAK, seq)
+                continue
+            if seq == BLOCK_END:
+                self._block_status(BLOCK_ACK, seq)
+                return
+            self.memory.write(addr + seq * block_size, payload)
+            self._block_status(BLOCK_ACK, seq)
+
+    def cmd_mem_read_blocks(self):
+        header = self._blocks_header()
+        if header is None:
+            return
+        addr, size, block_size = header
+        for offset in range(0, size, block_size):
+            data = self.memory.read(addr + offset,
+                                    min(block_size, size - offset))
+            self._send(data + u32.pack(crc32(data)))
@@ -0,0 +1,68 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import micromon
+from .log import Log
+import json
+import os
+from os import path
+
+class Journal:
+    """persistent record of how much of an image reached which address on
+    which serial port, so an interrupted upload can pick up where it
+    stopped"""
+    def __init__(self, filename=None):
+        self._file = filename or micromon.JOURNAL_PATH
+        try:
+            with open(self._file) as fp:
+                self._entries = json.load(fp)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def _key(port, addr):
+        return '%s@0x%08X' % (port, addr)
+
+    def verified(self, port, addr, digest, size, block_size):
+        """number of leading blocks recorded as verified for this image"""
+        entry = self._entries.get(self._key(port, addr))
+        if not entry:
+            return 0
+        if (entry['digest'], entry['size'], entry['block_size']) != \
+                (digest, size, block_size):
+            return 0
+        return entry['verified']
+
+    def update(self, port, addr, digest, size, block_size, verified):
+        self._entries[self._key(port, addr)] = {
+            'digest': digest,
+            'size': size,
+            'block_size': block_size,
+            'verified': verified,
+        }
+        self._save()
+
+    def _save(self):
+        tmp = self._file + '.tmp'
+        try:
+            os.makedirs(path.dirname(self._file), exist_ok=True)
+            with open(tmp, 'w') as fp:
+                json.dump(self._entries, fp, indent=2)
+            os.replace(tmp, self._file)
+        except OSError as inst:
+            Log.warning('Unable to save transfer journal: %(error)s',
+                        error=str(inst)).single()
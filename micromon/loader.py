@@ -20,90 +20,225 @@ from .config import Config
 from .log import Log
 import sys
 import os
+from os import path
 from binascii import crc32
 from time import sleep
 
 _loader_signature    = b'UART'
 
+# UART divider settings sent to the first stage loader for each baudrate
+BAUDRATES = {
+    19200: (11 << 16) | (39 << 4) | (1 << 1),
+    38400: (5 << 16) | (39 << 4) | (1 << 1),
+    57600: (3 << 16) | (39 << 4) | (1 << 1),
+    115200: (1 << 16) | (39 << 4) | (1 << 1),
+    230400: (7 << 16) | (4 << 4) | (1 << 1),
+    460800: (3 << 16) | (4 << 4) | (1 << 1),
+    614400: (2 << 16) | (4 << 4) | (1 << 1),
+    921600: (1 << 16) | (4 << 4) | (1 << 1),
+    1500000: (0 << 16) | (15 << 4) | (0 << 1),
+}
+
+# bytes exchanged to check the link when choosing a baudrate, through the
+# scratch area of core.py so that nothing loaded earlier is overwritten
+_link_check_size = 4096
+
+def _load_baudrates():
+    import json
+    try:
+        with open(micromon.BAUDRATE_CACHE_PATH) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+def _save_baudrates(known):
+    import json
+    try:
+        os.makedirs(path.dirname(micromon.BAUDRATE_CACHE_PATH), exist_ok=True)
+        with open(micromon.BAUDRATE_CACHE_PATH, 'w') as fp:
+            json.dump(known, fp, indent=2)
+    except OSError as inst:
+        Log.warning('Unable to save baudrate: %(error)s',
+                    error=str(inst)).single()
+
+class BootImage:
+    """the micromon binary pre-split into the pieces each boot mode sends"""
+    def __init__(self, data):
+        data = memoryview(bytes(data))
+        stage = bytearray(16384)
+        stage[:len(data[:16384])] = data[:16384]
+        stage = memoryview(bytes(stage))
+
+        self.size = len(data)
+        # 512 byte boot: first block, then the rest via the first stage
+        self.stage_512 = data[:512]
+        self.rest_512 = data[512:]
+        # 16k boot: the whole zero padded stage, or its remainder after a
+        # failed 512 byte attempt, then the rest via the first stage
+        self.stage_16k = stage
+        self.stage_16k_tail = stage[512:]
+        self.rest_16k = data[16384:]
+
+_boot_images = {}
+
+def boot_image(filename):
+    """BootImage for filename, reread only when the file changes"""
+    st = os.stat(filename)
+    key = (path.realpath(filename), st.st_mtime_ns, st.st_size)
+    image = _boot_images.get(key)
+    if image is None:
+        with open(filename, 'rb') as fp:
+            image = BootImage(fp.read())
+        _boot_images[key] = image
+    return image
+
 class Loader:
-    def __init__(self, target, file=micromon.MICROMON_BIN):
+    def __init__(self, target, file=None):
         self._target = target
         self._file = file
 
+        try:
+            if file is None:
+                micromon.build()
+                self._file = micromon.MICROMON_BIN
+            image = boot_image(self._file)
+            baudrate = Config.get('monitor.baudrate')
+            if baudrate != 'auto':
+                self._boot(image, int(baudrate))
+            else:
+                self._boot_auto(image)
+
+        except Exception as inst:
+            Log.fatal(str(inst)).single()
+            sys.exit(1)
+
+    def _boot(self, image, baudrate):
         powerup_delay = Config.get('target.powerup_delay')
 
+        self._baudrate = baudrate
+        self._target.signature_checked = False
+        while True:
+            self._target.set_baudrate(19200)
+
+            self._target.set_uart_boot(True)
+            if self._target.get_power_state():
+                self._target.reset()
+            else:
+                print('Please power on the target')
+                while not self._target.get_power_state():
+                    sleep(0.1)
+                self._target.purge_input()
+                sleep(powerup_delay)
+            self._target.set_uart_boot(False)
+
+            if self._init_core(image):
+                break
+
+        # the end of the image may still be queued in the serial adapter,
+        # allow for the time it takes on the wire
+        data_timeout = self._target.timeout
+        self._target.timeout = data_timeout + image.size * 10.0 / baudrate
         try:
-            core = self._read_core()
-            while True:
-                self._target.set_baudrate(19200)
+            response = self._target.read_u8()
+        finally:
+            self._target.timeout = data_timeout
+        if response != 0x5A:
+            raise Exception('Invalid handshake')
+        self._target.write_u8(0xA5)
 
-                self._target.set_uart_boot(True)
-                if self._target.get_power_state():
-                    self._target.reset()
-                else:
-                    print('Please power on the target')
-                    while not self._target.get_power_state():
-                        sleep(0.1)
-                    self._target.purge_input()
-                    sleep(powerup_delay)
-                self._target.set_uart_boot(False)
-
-                if self._init_core(core):
+    def _boot_auto(self, image):
+        """boot at the fastest baudrate that passes a link check, starting
+        from the one that last worked on this serial port"""
+        port = self._target.port
+        known = _load_baudrates()
+        baudrates = sorted(BAUDRATES, reverse=True)
+        if known.get(port) in baudrates:
+            baudrates = baudrates[baudrates.index(known[port]):]
+
+        for baudrate in baudrates:
+            try:
+                self._boot(image, baudrate)
+                if self._check_link():
                     break
+            except Exception as inst:
+                Log.debug(str(inst)).single()
+            Log.warning('Link check at %(baudrate)d baud failed',
+                        baudrate=baudrate).single()
+            if Config.get('target.reset_pin') == 'none':
+                self._wait_for_reset()
+        else:
+            raise Exception('No baudrate passed the link check')
 
-            response = self._target.read_u8()
-            if response != 0x5A:
-                raise Exception('Invalid handshake')
-            target.write_u8(0xA5)
+        if known.get(port) != baudrate:
+            known[port] = baudrate
+            _save_baudrates(known)
 
-        except Exception as inst:
-            Log.fatal(str(inst)).single()
-            sys.exit(1)
+    def _wait_for_reset(self):
+        """the boot ROM only listens after a reset, wait for the user to
+        do one"""
+        if Config.get('target.power_detect_pin') != 'none':
+            # _boot waits for the power to come back
+            print('Please power cycle the target')
+            while self._target.get_power_state():
+                sleep(0.1)
+            return
+        try:
+            input('Please reset the target and press enter')
+        except EOFError:
+            raise Exception('Unable to reset the target for the next '
+                            'baudrate')
 
-    def _read_core(self):
-        fp = open(self._file, 'rb')
-        fp.seek(0, os.SEEK_END)
-        size = fp.tell()
-        fp.seek(0, os.SEEK_SET)
+    def _check_link(self):
+        """exchange a crc checked pattern with the freshly booted core"""
+        from .core import Core, SCRATCH_ADDR
 
-        core = fp.read(size)
-        return core
+        with Log.debug('Checking link at %(baudrate)d baud',
+                       baudrate=self._baudrate):
+            core = Core(self._target)
+            pattern = os.urandom(_link_check_size)
+            if not core.mem_write(SCRATCH_ADDR, pattern, compress=False):
+                return False
+            data, crc_ok = core.mem_read(SCRATCH_ADDR, len(pattern))
+            return crc_ok and data == pattern
 
-    def _init_core(self, core):
+    def _init_core(self, image):
         uart_boot_size = Config.get('monitor.uart_boot_size')
 
         if uart_boot_size in ['auto', '512']:
-            if not self._write(core[:512]):
+            if not self._write(image.stage_512):
                 return False
-            if self._loader_signature():
-                if not self._loader_512(core):
+            if self._loader_signature(image.stage_512):
+                if not self._loader_512(image):
                     return False
             elif uart_boot_size == 'auto':
-                data = core[512:16384]
-                data += b'\0' * (16384 - 512 - len(data))
-                if not self._write(data):
+                if not self._write(image.stage_16k_tail):
                     return False
-                if self._loader_signature():
-                    self._loader_16k(core)
+                if self._loader_signature(image.stage_16k_tail):
+                    self._loader_16k(image)
                 else:
                     raise Exception('Detect boot failed')
             else:
                 raise Exception('512 boot failed')
 
         elif uart_boot_size == '16k':
-            data = core[:16384]
-            data += b'\0' * (16384 - len(data))
-            if not self._write(data):
+            if not self._write(image.stage_16k):
                 return False
-            if self._loader_signature():
-                self._loader_16k(core)
+            if self._loader_signature(image.stage_16k):
+                self._loader_16k(image)
             else:
                 raise Exception('16k boot failed')
 
         return True
 
-    def _loader_signature(self):
-        response = self._target.read(4)
+    def _loader_signature(self, stage):
+        # the end of the stage may still be queued in the serial adapter,
+        # allow for the time it takes on the wire at boot ROM speed
+        data_timeout = self._target.timeout
+        self._target.timeout = data_timeout + len(stage) * 10.0 / 19200
+        try:
+            response = self._target.read(4)
+        finally:
+            self._target.timeout = data_timeout
         if not response:
             return False
 
@@ -112,32 +247,21 @@ class Loader:
         else:
             raise Exception('Communication error occured')
 
-    def _loader_512(self, core):
+    def _loader_512(self, image):
         self._set_baudrate()
-        if not self._load_rest(core[512:]):
+        if not self._load_rest(image.rest_512):
             return False
         return True
 
-    def _loader_16k(self, core):
+    def _loader_16k(self, image):
         self._set_baudrate()
-        if not self._load_rest(core[16384:]):
+        if not self._load_rest(image.rest_16k):
             return False
         return True
 
     def _set_baudrate(self):
-        baudrate = Config.get('monitor.baudrate')
-        baudrates = {
-            19200: (11 << 16) | (39 << 4) | (1 << 1),
-            38400: (5 << 16) | (39 << 4) | (1 << 1),
-            57600: (3 << 16) | (39 << 4) | (1 << 1),
-            115200: (1 << 16) | (39 << 4) | (1 << 1),
-            230400: (7 << 16) | (4 << 4) | (1 << 1),
-            460800: (3 << 16) | (4 << 4) | (1 << 1),
-            614400: (2 << 16) | (4 << 4) | (1 << 1),
-            921600: (1 << 16) | (4 << 4) | (1 << 1),
-            1500000: (0 << 16) | (15 << 4) | (0 << 1),
-        }
-        baudinfo = baudrates[baudrate]
+        baudrate = self._baudrate
+        baudinfo = BAUDRATES[baudrate]
 
         with Log.debug('Setting target baudrate to %(baudrate)d',
                        baudrate=baudrate):
@@ -162,20 +286,16 @@ class Loader:
 
     def _write(self, data):
         size = len(data)
-        blocksize = 512
-        blocks = (size + blocksize-1) / blocksize
-        block = 0
-
-        log_entry = Log.info('Sending block %(block)d of %(blocks)d block(s)',
-                             block=block + 1, blocks=blocks)
-        with log_entry:
-            while block + 1 < blocks:
-                log_entry.update(block=block + 1)
-                if not self._target.get_power_state():
-                    with Log.warning('Power lost'):
-                        return False
-                offset = block * blocksize
-                self._target.write(data[offset:offset+blocksize])
-                block += 1
+        progress = Log.progress('Sending %(size)d bytes', size, size=size)
+        with progress:
+            blocks = self._target.write_blocks(data)
+            while self._target.get_power_state():
+                n = next(blocks, None)
+                if n is None:
+                    break
+                progress.advance(n)
+            else:
+                with Log.warning('Power lost'):
+                    return False
 
         return True
@@ -17,16 +17,28 @@
 
 from .config import Config
 import sys
+from time import perf_counter
 
 levels = ('FATAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG')
 
 class BaseLogger:
-    def __init__(self, max_level):
-        self._max_level = levels.index(max_level)
+    def __init__(self, max_level=None):
+        """max_level of None follows general.log_level, looked up when the
+        first entry is logged"""
+        self._max_level = None
+        if max_level is not None:
+            self._max_level = levels.index(max_level)
         self._entry = {}
 
+    @property
+    def max_level(self):
+        if self._max_level is None:
+            max_level = Config.get('general.log_level').upper()
+            self._max_level = levels.index(max_level)
+        return self._max_level
+
     def begin_entry(self, n, level, format, **values):
-        if self._max_level >= level:
+        if self.max_level >= level:
             entry = {'level': level, 'format': format, 'values': values}
             self._entry[n] = entry
             return entry
@@ -51,20 +63,100 @@ class StdoutLogger(BaseLogger):
             for key in list(self._entry.keys()):
                 if key != n:
                     self.end_entry(key)
-            sys.stdout.write(entry['format'] % entry['values'])
+            line = entry['format'] % entry['values']
+            sys.stdout.write(line)
+            self._width = len(line)
             sys.stdout.flush()
 
     def update_entry(self, n, format, **values):
         entry = BaseLogger.update_entry(self, n, format, **values)
         if entry:
-            sys.stdout.write('\r' + entry['format'] % entry['values'])
+            line = entry['format'] % entry['values']
+            # blank out what is left of a longer previous line
+            sys.stdout.write('\r' + line.ljust(self._width))
             sys.stdout.flush()
+            self._width = len(line)
         
     def end_entry(self, n):
         if BaseLogger.end_entry(self, n):
             sys.stdout.write('\n')
 
 
+class _NullEntry:
+    """stands in for entries of a level no logger shows"""
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, tb):
+        pass
+    def update(self, format=None, **values):
+        pass
+    def advance(self, n):
+        pass
+    def single(self):
+        pass
+
+_null_entry = _NullEntry()
+
+def _format_rate(rate):
+    for unit in ('B', 'KiB', 'MiB'):
+        if rate < 1024.0:
+            break
+        rate /= 1024.0
+    return '%.1f %s/s' % (rate, unit)
+
+def _format_eta(seconds):
+    seconds = int(seconds + 0.5)
+    return '%d:%02d' % (seconds // 60, seconds % 60)
+
+class ProgressEntry:
+    """entry for a transfer of total bytes.  advance() only adds up until
+    the next redraw is due, at most general.progress_rate times per second
+    or on every advance if that is not above zero, then percentage,
+    throughput and ETA are appended to the message."""
+    suffix = ' %(percent)3d%%  %(rate)s  ETA %(eta)s'
+
+    def __init__(self, level_name, format, total, **values):
+        self.total = total
+        self.done = 0
+        self._start = perf_counter()
+        rate = Config.get('general.progress_rate')
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = self._start + self._interval
+        entry = getattr(Log, level_name.lower())
+        self._entry = entry(format + self.suffix, percent=0, rate='-',
+                            eta='-:--', **values)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        self._draw(perf_counter())
+        self._entry.__exit__(type, value, tb)
+
+    def advance(self, n):
+        self.done += n
+        now = perf_counter()
+        if now >= self._next:
+            self._draw(now)
+
+    def update(self, format=None, **values):
+        self._entry.update(format and format + self.suffix, **values)
+
+    def single(self):
+        self._draw(perf_counter())
+        self._entry.single()
+
+    def _draw(self, now):
+        self._next = now + self._interval
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        left = self.total - self.done
+        self._entry.update(
+            percent=self.done * 100 // self.total if self.total else 100,
+            rate=_format_rate(rate),
+            eta=_format_eta(left / rate) if rate else '-:--')
+
+
 def _make_context_manager(level_name):
     level = levels.index(level_name)
     class context_manager:
@@ -89,11 +181,15 @@ def _make_context_manager(level_name):
         def single(self):
             for logger in Log.loggers:
                 logger.end_entry(self._n)
-    return context_manager
+
+    def entry(format, **values):
+        if not Log.enabled(level):
+            return _null_entry
+        return context_manager(format, **values)
+    return staticmethod(entry)
 
 class Log:
-    default_level = Config.get('general.log_level').upper()
-    loggers = [StdoutLogger(default_level)]
+    loggers = [StdoutLogger()]
     last_n = 0
 
     fatal = _make_context_manager('FATAL')
@@ -102,3 +198,17 @@ class Log:
     info = _make_context_manager('INFO')
     debug = _make_context_manager('DEBUG')
 
+    @staticmethod
+    def enabled(level):
+        """whether any logger shows entries of level, a name or an index"""
+        if type(level) == str:
+            level = levels.index(level.upper())
+        return any(logger.max_level >= level for logger in Log.loggers)
+
+    @staticmethod
+    def progress(format, total, level='INFO', **values):
+        """ProgressEntry for a transfer of total bytes"""
+        if not Log.enabled(level):
+            return _null_entry
+        return ProgressEntry(level, format, total, **values)
+
@@ -0,0 +1,160 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""LZ4 block format compressor, decoded by mem_write_lz on the target
+
+Each sequence is a token byte (literal length << 4 | match length - 4),
+optional length extension bytes, the literals, a little endian u16 match
+offset and optional match length extension bytes.  The final sequence
+carries literals only.
+"""
+
+MIN_MATCH = 4
+MAX_OFFSET = 0xFFFF
+_LAST_LITERALS = 5
+_MATCH_LIMIT = 12
+
+def _put_length(out, n):
+    while n >= 255:
+        out.append(255)
+        n -= 255
+    out.append(n)
+
+def _put_sequence(out, literals, offset, match_len):
+    lit_len = len(literals)
+    ml = match_len - MIN_MATCH
+    out.append((min(lit_len, 15) << 4) | min(ml, 15))
+    if lit_len >= 15:
+        _put_length(out, lit_len - 15)
+    out += literals
+    out.append(offset & 0xFF)
+    out.append(offset >> 8)
+    if ml >= 15:
+        _put_length(out, ml - 15)
+
+def _put_last_literals(out, literals):
+    lit_len = len(literals)
+    out.append(min(lit_len, 15) << 4)
+    if lit_len >= 15:
+        _put_length(out, lit_len - 15)
+    out += literals
+
+def _match_length(src, ref, pos, limit):
+    length = MIN_MATCH
+    for step in (256, 16, 1):
+        while (pos + length + step <= limit and
+               src[ref+length:ref+length+step] == src[pos+length:pos+length+step]):
+            length += step
+    return length
+
+def compress(data):
+    """greedy single pass compression, returns bytes"""
+    src = bytes(data)
+    size = len(src)
+    out = bytearray()
+    table = {}
+    anchor = 0
+    pos = 0
+    misses = 0
+    match_limit = size - _MATCH_LIMIT
+    copy_limit = size - _LAST_LITERALS
+
+    while pos < match_limit:
+        key = src[pos:pos+MIN_MATCH]
+        ref = table.get(key)
+        table[key] = pos
+        if ref is None or pos - ref > MAX_OFFSET:
+            # skip ahead faster through incompressible data
+            misses += 1
+            pos += 1 + (misses >> 6)
+            continue
+        misses = 0
+
+        length = _match_length(src, ref, pos, copy_limit)
+        _put_sequence(out, src[anchor:pos], pos - ref, length)
+        pos += length
+        anchor = pos
+
+    _put_last_literals(out, src[anchor:])
+    return bytes(out)
+
+def _sequences(packed):
+    """yield (literal start, literal end, offset, match length, position
+    after the sequence) for each sequence, offset is None for the last"""
+    pos = 0
+    end = len(packed)
+    while pos < end:
+        token = packed[pos]
+        pos += 1
+        lit_len = token >> 4
+        if lit_len == 15:
+            while True:
+                b = packed[pos]
+                pos += 1
+                lit_len += b
+                if b != 255:
+                    break
+        lit_start = pos
+        pos += lit_len
+        if pos >= end:
+            yield lit_start, pos, None, 0, pos
+            return
+        offset = packed[pos] | (packed[pos + 1] << 8)
+        pos += 2
+        match_len = token & 15
+        if match_len == 15:
+            while True:
+                b = packed[pos]
+                pos += 1
+                match_len += b
+                if b != 255:
+                    break
+        yield lit_start, lit_start + lit_len, offset, match_len + MIN_MATCH, pos
+
+def decompress(packed, size=None):
+    out = bytearray()
+    for lit_start, lit_end, offset, match_len, _ in _sequences(packed):
+        out += packed[lit_start:lit_end]
+        if offset is None:
+            break
+        if offset == 0 or offset > len(out):
+            raise ValueError('Invalid match offset')
+        start = len(out) - offset
+        while match_len > 0:
+            chunk = out[start:start + min(offset, match_len)]
+            out += chunk
+            start += len(chunk)
+            match_len -= len(chunk)
+    if size is not None and len(out) != size:
+        raise ValueError('Decompressed size mismatch')
+    return bytes(out)
+
+def inplace_margin(packed, size):
+    """bytes past the end of the output needed to hold the packed stream so
+    it can be decoded in place without overwriting unread input"""
+    need = 0
+    written = 0
+    for lit_start, lit_end, offset, match_len, consumed in _sequences(packed):
+        # literals are read before each byte is written, so the write
+        # position may reach the read position but never pass it
+        written += lit_end - lit_start
+        need = max(need, written - lit_end)
+        if offset is None:
+            break
+        written += match_len
+        need = max(need, written - consumed)
+    return max(0, need - size + len(packed))
@@ -0,0 +1,114 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""boot and load many boards at once
+
+Every board gets its own worker thread.  The workers spend nearly all of
+their time blocked in serial I/O with the GIL released, so the run scales
+with the number of serial adapters.  The image is shared between them as
+one read-only memoryview.
+"""
+
+import micromon
+from .core import Core
+from .loader import Loader
+from .log import Log, StdoutLogger, levels
+from .target import Target
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from glob import glob, has_magic
+from time import perf_counter
+
+BoardResult = namedtuple('BoardResult',
+                         ('port', 'ok', 'boot_s', 'load_s', 'total_s', 'error'))
+
+def expand_ports(patterns):
+    """serial ports named by patterns, which may be globs like
+    /dev/ttyUSB*, sorted and without duplicates"""
+    ports = []
+    for pattern in patterns:
+        matches = sorted(glob(pattern)) if has_magic(pattern) else [pattern]
+        for port in matches:
+            if port not in ports:
+                ports.append(port)
+    return ports
+
+def flash(port, image, load_address, exec_address, machine_type=None):
+    """boot the board on port, write image to load_address and start it,
+    with run_kernel if a machine_type is given.  Returns a BoardResult."""
+    start = perf_counter()
+    boot_s = load_s = None
+    target = None
+    try:
+        target = Target(port)
+        Loader(target)
+        core = Core(target)
+        boot_s = perf_counter() - start
+
+        # compression is pure python and holds the GIL, it would serialize
+        # the workers
+        if not core.mem_write(load_address, image, compress=False):
+            raise Exception('Image crc mismatch')
+        load_s = perf_counter() - start - boot_s
+
+        if machine_type is None:
+            core.run(exec_address)
+        else:
+            core.run_kernel(exec_address, machine_type)
+        ok, error = True, None
+    except SystemExit:
+        # Target and Loader report their errors and exit
+        ok, error = False, 'Unable to open or boot the target'
+    except Exception as inst:
+        ok, error = False, str(inst)
+    finally:
+        if target is not None:
+            target.close()
+    return BoardResult(port, ok, boot_s, load_s, perf_counter() - start,
+                       error)
+
+def flash_all(ports, image, load_address, exec_address=None,
+              machine_type=None, jobs=None):
+    """flash() every port concurrently with up to jobs workers, one per
+    port by default.  Returns the BoardResults in the order of ports."""
+    if exec_address is None:
+        exec_address = load_address
+    if not ports:
+        return []
+    # build once up front instead of racing make from every worker
+    micromon.build()
+    view = memoryview(image).toreadonly()
+
+    # progress lines of concurrent transfers would overwrite each other,
+    # keep only warnings and errors while the workers run
+    loggers = Log.loggers
+    Log.loggers = [StdoutLogger(levels[min(logger.max_level,
+                                           levels.index('WARNING'))])
+                   for logger in loggers]
+    try:
+        results = {}
+        with ThreadPoolExecutor(jobs or len(ports)) as executor:
+            futures = {executor.submit(flash, port, view, load_address,
+                                       exec_address, machine_type): port
+                       for port in ports}
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.port] = result
+    finally:
+        Log.loggers = loggers
+
+    return [results[port] for port in ports]
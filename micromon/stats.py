@@ -0,0 +1,168 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""per command counters for a Core session
+
+Target keeps running totals of the bytes it moved and the reads that
+timed out.  Core takes a snapshot of those when it starts a command and
+charges the difference to the command's opcode when it is done, so the
+bookkeeping is a few integer operations and two clock reads per command.
+"""
+
+from time import perf_counter, strftime
+
+class CommandStats:
+    __slots__ = ('calls', 'bytes_out', 'bytes_in', 'time', 'max_time',
+                 'crc_failures', 'timeouts')
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.crc_failures = 0
+        self.timeouts = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def merge(self, other):
+        for name in ('calls', 'bytes_out', 'bytes_in', 'time', 'crc_failures',
+                     'timeouts'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_time = max(self.max_time, other.max_time)
+
+
+class Stats:
+    def __init__(self, target):
+        self._target = target
+        self._commands = {}
+        self._start = perf_counter()
+
+    def _command(self, name):
+        command = self._commands.get(name)
+        if command is None:
+            command = self._commands[name] = CommandStats()
+        return command
+
+    def begin(self):
+        """mark the start of a command, pass the result to end()"""
+        target = self._target
+        return (perf_counter(), target.bytes_sent, target.bytes_received,
+                target.timeouts)
+
+    def end(self, name, start, ok=True):
+        """charge everything since begin() to opcode name.  A command that
+        is not ok without a timeout counts as a crc failure."""
+        elapsed = perf_counter() - start[0]
+        target = self._target
+        command = self._command(name)
+        command.calls += 1
+        command.bytes_out += target.bytes_sent - start[1]
+        command.bytes_in += target.bytes_received - start[2]
+        timeouts = target.timeouts - start[3]
+        command.timeouts += timeouts
+        if not ok and not timeouts:
+            command.crc_failures += 1
+        command.time += elapsed
+        if elapsed > command.max_time:
+            command.max_time = elapsed
+
+    def add(self, name, bytes_out, bytes_in, elapsed, timeouts=0):
+        """charge one command whose bytes were counted by the caller"""
+        command = self._command(name)
+        command.calls += 1
+        command.bytes_out += bytes_out
+        command.bytes_in += bytes_in
+        command.timeouts += timeouts
+        command.time += elapsed
+        if elapsed > command.max_time:
+            command.max_time = elapsed
+
+    def crc_failure(self, name, count=1):
+        self._command(name).crc_failures += count
+
+    def snapshot(self):
+        return _snapshot([self])
+
+    def dump(self, filename):
+        """write a snapshot as JSON"""
+        _dump(filename, [self])
+
+    def dump_at_exit(self, filename):
+        """dump when the process exits, merged with every other Stats
+        dumped to the same file, such as the one of the link check Core
+        or those of the other boards"""
+        sessions = _dumps.get(filename)
+        if sessions is None:
+            import atexit
+            sessions = _dumps[filename] = []
+            atexit.register(_dump, filename, sessions)
+        if self not in sessions:
+            sessions.append(self)
+
+
+# the Stats to dump at exit, by file name
+_dumps = {}
+
+def _snapshot(sessions):
+    """the counters of sessions added up, per command and in total"""
+    merged = {}
+    for stats in sessions:
+        for name, command in stats._commands.items():
+            merged.setdefault(name, CommandStats()).merge(command)
+    totals = CommandStats()
+    for command in merged.values():
+        totals.merge(command)
+    ports = []
+    for stats in sessions:
+        if stats._target.port not in ports:
+            ports.append(stats._target.port)
+    now = perf_counter()
+    return {
+        'port': ', '.join(ports),
+        'session_s': max([now - stats._start for stats in sessions],
+                         default=0.0),
+        'commands': {name: command.as_dict()
+                     for name, command in sorted(merged.items())},
+        'totals': totals.as_dict(),
+    }
+
+def _dump(filename, sessions):
+    import json
+    snapshot = _snapshot(sessions)
+    snapshot['date'] = strftime('%Y-%m-%dT%H:%M:%S')
+    with open(filename, 'w') as fp:
+        json.dump(snapshot, fp, indent=2)
+
+
+def format_stats(snapshot):
+    """snapshot() as a table, one line per opcode"""
+    lines = ['%-18s %7s %11s %11s %10s %10s %5s %5s' % (
+        'command', 'calls', 'bytes out', 'bytes in', 'total ms', 'max ms',
+        'crc', 'tmo')]
+    rows = list(snapshot['commands'].items())
+    rows.append(('total', snapshot['totals']))
+    for name, c in rows:
+        lines.append('%-18s %7d %11d %11d %10.1f %10.2f %5d %5d' % (
+            name, c['calls'], c['bytes_out'], c['bytes_in'],
+            c['time'] * 1000.0, c['max_time'] * 1000.0, c['crc_failures'],
+            c['timeouts']))
+    lines.append('session %.1f s on %s' % (snapshot['session_s'],
+                                           snapshot['port']))
+    return '\n'.join(lines)
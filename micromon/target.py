@@ -17,8 +17,7 @@
 
 from .config import Config
 from .log import Log
-from serial import Serial
-from time import sleep
+from time import perf_counter, sleep
 from struct import Struct
 import sys
 
@@ -26,13 +25,43 @@ u8 = Struct('<B')
 u16 = Struct('<H')
 u32 = Struct('<L')
 
+# adaptive block sizes start at the first and double up to the second
+_min_block_size = 512
+_max_block_size = 65536
+
 class Target:
     """abstraction for direct serial communication to the target"""
-    def __init__(self):
-        serial_port = Config.get('target.serial_port')
+    def __init__(self, serial_port=None):
+        if serial_port is None:
+            serial_port = Config.get('target.serial_port')
         data_timeout = Config.get('target.data_timeout')
+        block_size = Config.get('target.block_size')
+        self.port = serial_port
+        self.signature_checked = False
+        # running totals, see stats.py
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.timeouts = 0
+        self._drained = True
+
+        if block_size == 'auto':
+            self.adaptive = True
+            block_size = _min_block_size
+        else:
+            self.adaptive = False
+            try:
+                block_size = int(block_size, 0)
+            except ValueError:
+                block_size = 0
+            if block_size <= 0:
+                raise ValueError('invalid setting for \'target.block_size\'')
+        self._initial_block_size = block_size
+        self._reset_block_size()
 
         with Log.debug('Opening serial port'):
+            # pyserial is the slowest import of a script run, load it only
+            # when a port is actually opened
+            from serial import Serial
             try:
                 self.sp = Serial(serial_port, 19200, timeout=data_timeout)
             except:
@@ -41,6 +70,10 @@ class Target:
             self.sp.flushOutput()
             self.sp.flushInput()
 
+    def close(self):
+        self.drain()
+        self.sp.close()
+
     def _set_pin(self, pin, state):
         if pin == 'rts':
             self.sp.rts = state
@@ -72,9 +105,24 @@ class Target:
     def set_baudrate(self, baudrate):
         with Log.debug('Setting local baudrate to %(baudrate)s',
                        baudrate=baudrate):
+            self.drain()
             self.sp.flushOutput()
             self.sp.flushInput()
             self.sp.baudrate = baudrate
+        self._reset_block_size()
+
+    @property
+    def baudrate(self):
+        return self.sp.baudrate
+
+    @property
+    def timeout(self):
+        return self.sp.timeout
+
+    @timeout.setter
+    def timeout(self, seconds):
+        if seconds != self.sp.timeout:
+            self.sp.timeout = seconds
 
     def purge_input(self):
         self.sp.flushInput()
@@ -110,20 +158,108 @@ class Target:
             return True
 
     def write(self, data):
+        """queue data for sending without waiting for it to leave, reads
+        wait for that first"""
         self.sp.write(data)
-        self.sp.flush()
+        self.bytes_sent += len(data)
+        self._drained = False
+
+    def drain(self):
+        """wait until everything written is on the wire"""
+        if not self._drained:
+            self.sp.flush()
+            self._drained = True
+
+    def set_block_size(self, block_size):
+        """send in blocks of block_size bytes from now on, this ends the
+        adaptive mode"""
+        self.adaptive = False
+        self._initial_block_size = block_size
+        self._reset_block_size()
+
+    def _reset_block_size(self):
+        self.block_size = self._initial_block_size
+        self._settled = not self.adaptive
+        self._best_rate = 0.0
+        self._probe_bytes = 0
+        self._probe_time = 0.0
+
+    def write_blocks(self, data):
+        """write data, any buffer such as bytes, bytearray or mmap, in
+        block_size slices of one memoryview without copying.  Yields the
+        size of each block once it is sent.
+
+        In adaptive mode a few blocks are timed at each block size and the
+        size is doubled for as long as that raises the throughput.  The
+        size it settles on is kept until the baudrate changes."""
+        view = memoryview(data).cast('B')
+        size = len(view)
+        offset = 0
+        while offset < size:
+            n = min(self.block_size, size - offset)
+            start = perf_counter()
+            self.write(view[offset:offset+n])
+            self.drain()
+            if not self._settled and n == self.block_size:
+                self._probe(n, perf_counter() - start)
+            offset += n
+            yield n
+
+    def _probe(self, n, elapsed):
+        self._probe_bytes += n
+        self._probe_time += elapsed
+        if self._probe_bytes < 4 * self.block_size:
+            return
+
+        rate = self._probe_bytes / max(self._probe_time, 1e-6)
+        self._probe_bytes = 0
+        self._probe_time = 0.0
+        if rate > self._best_rate * 1.05:
+            self._best_rate = rate
+            if self.block_size < _max_block_size:
+                self.block_size *= 2
+                return
+        elif self.block_size > _min_block_size:
+            self.block_size //= 2
+        self._settled = True
+        Log.debug('Block size settled at %(size)d bytes',
+                  size=self.block_size).single()
 
     def read(self, bytes):
+        self.drain()
         data = self.sp.read(bytes)
+        self.bytes_received += len(data)
+        if len(data) != bytes:
+            self.timeouts += 1
         return data
 
+    def readinto(self, buffer):
+        """fill a writable buffer in place, returns the number of bytes read"""
+        self.drain()
+        view = memoryview(buffer)
+        size = len(view)
+        count = 0
+        while count < size:
+            n = self.sp.readinto(view[count:])
+            if not n:
+                self.timeouts += 1
+                break
+            count += n
+        self.bytes_received += count
+        return count
+
     def _write_struct(self, data, t):
         data = t.pack(data)
         self.sp.write(data)
+        self.bytes_sent += t.size
+        self._drained = False
 
     def _read_struct(self, t):
+        self.drain()
         data = self.sp.read(t.size)
+        self.bytes_received += len(data)
         if not data or len(data) != t.size:
+            self.timeouts += 1
             return None
         return t.unpack(data)[0]
 
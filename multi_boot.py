@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+#
+#  Copyright (C) 2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import argparse
+import sys
+from time import perf_counter
+from micromon.multi import expand_ports, flash_all
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Boot, load and start an image on many boards at once.')
+    parser.add_argument('filename')
+    parser.add_argument('load_address', nargs='?', type=lambda s: int(s, 0),
+                        default=0x000000)
+    parser.add_argument('exec_address', nargs='?', type=lambda s: int(s, 0))
+    parser.add_argument('-p', '--port', action='append', required=True,
+                        help='serial port or glob such as /dev/ttyUSB*, '
+                             'may be repeated')
+    parser.add_argument('-k', '--kernel', action='store_true',
+                        help='start the image as a Linux kernel')
+    parser.add_argument('-m', '--machine-type', type=int, default=2028,
+                        help='machine type passed to a kernel')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='boards handled at once, defaults to all')
+    args = parser.parse_args()
+
+    ports = expand_ports(args.port)
+    if not ports:
+        print('No serial ports match')
+        sys.exit(1)
+
+    fp = open(args.filename, 'rb')
+    data = fp.read()
+    fp.close()
+
+    print(f'Flashing {len(ports)} board(s)')
+    start = perf_counter()
+    results = flash_all(ports, data, args.load_address, args.exec_address,
+                        args.machine_type if args.kernel else None, args.jobs)
+    elapsed = perf_counter() - start
+
+    for r in results:
+        if r.ok:
+            print(f'{r.port:<20} ok      boot {r.boot_s:6.2f} s  '
+                  f'load {r.load_s:6.2f} s  total {r.total_s:6.2f} s')
+        else:
+            print(f'{r.port:<20} FAILED  {r.error}')
+
+    failed = sum(not r.ok for r in results)
+    print(f'{len(results) - failed} of {len(results)} board(s) ok '
+          f'in {elapsed:.2f} s')
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
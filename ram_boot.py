@@ -16,31 +16,45 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 #
 
-import sys
+import argparse
 from micromon import *
+from micromon.elf import ElfImage, is_elf
 
 # TODO: Integrate into the Micromon shell
 
 def main():
-    filename = sys.argv[1]
-
-    load_address = 0x000000
-    if len(sys.argv) > 2:
-        load_address = int(sys.argv[2], 0)
-
-    exec_address = load_address
-    if len(sys.argv) > 3:
-        exec_address = int(sys.argv[3], 0)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    parser.add_argument('load_address', nargs='?', type=lambda s: int(s, 0),
+                        default=0x000000)
+    parser.add_argument('exec_address', nargs='?', type=lambda s: int(s, 0))
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help='continue an interrupted upload of this image')
+    args = parser.parse_args()
+
+    filename = args.filename
+    load_address = args.load_address
+    exec_address = args.exec_address
 
     target = Target()
     loader = Loader(target)
     core = Core(target)
 
-    fp = open(filename, 'rb')
-    data = fp.read()
-    fp.close()
+    if is_elf(filename):
+        # an ELF image carries its own load and entry addresses
+        with ElfImage(filename) as image:
+            assert image.load(core, resume=args.resume)
+            if exec_address is None:
+                exec_address = image.entry
+    else:
+        fp = open(filename, 'rb')
+        data = fp.read()
+        fp.close()
+
+        assert core.mem_write(load_address, data, resume=args.resume)
+        if exec_address is None:
+            exec_address = load_address
 
-    assert core.mem_write(load_address, data)
     core.run(exec_address)
 
 if __name__ == '__main__':
@@ -0,0 +1,51 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+"""fixtures that boot a Core on micromon.emulator over a pty"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from micromon.config import Config
+from micromon.core import Core
+from micromon.emulator import Emulator
+from micromon.loader import Loader
+from micromon.target import Target
+
+@pytest.fixture
+def emulator():
+    return Emulator('512', throttle=False)
+
+@pytest.fixture
+def target(emulator, tmp_path):
+    # the emulator does not run the image, any bytes will do
+    image = tmp_path / 'micromon.bin'
+    image.write_bytes(bytes(2048))
+    Config.set('monitor.baudrate', '1500000')
+    Config.set('monitor.uart_boot_size', '512')
+    target = Target(emulator.open_pty())
+    Loader(target, str(image))
+    yield target
+    target.close()
+
+@pytest.fixture
+def core(target):
+    return Core(target)
@@ -0,0 +1,61 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import os
+from time import perf_counter
+
+import pytest
+
+from micromon.core import SCRATCH_ADDR
+from micromon.emulator import Emulator
+
+@pytest.fixture
+def emulator():
+    # the timeouts only bite at the speed of a real line
+    return Emulator('512')
+
+def test_reliable_transfers_survive_errors(core, emulator):
+    data = os.urandom(16384)
+    emulator.error_rate = 0.0002
+    assert core.mem_write_reliable(SCRATCH_ADDR, data)
+    assert core.mem_read_reliable(SCRATCH_ADDR, len(data)) == (data, True)
+    emulator.error_rate = 0.0
+    assert emulator.memory.read(SCRATCH_ADDR, len(data)) == data
+
+def test_write_given_up_on_leaves_core_usable(core, emulator, monkeypatch):
+    close_blocks = core._close_blocks
+    closed = []
+    def recover(*args):
+        # the line comes back just as the transfer is given up on
+        emulator.error_rate = 0.0
+        closed.append(args)
+        return close_blocks(*args)
+    monkeypatch.setattr(core, '_close_blocks', recover)
+    emulator.memory.write(SCRATCH_ADDR + 0x8000, b'\x78\x56\x34\x12')
+    emulator.error_rate = 0.01
+    assert not core.mem_write_reliable(SCRATCH_ADDR, os.urandom(8192),
+                                       retries=4)
+    assert closed
+    assert core.read_u32(SCRATCH_ADDR + 0x8000) == 0x12345678
+
+def test_write_ends_by_its_timeout(core, emulator):
+    emulator.memory.write(SCRATCH_ADDR, b'\x78\x56\x34\x12')
+    start = perf_counter()
+    assert not core.mem_write_reliable(SCRATCH_ADDR + 4, os.urandom(1 << 18),
+                                       timeout=0.2)
+    assert perf_counter() - start < 5
+    assert core.read_u32(SCRATCH_ADDR) == 0x12345678
@@ -0,0 +1,59 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import importlib.util
+import io
+import os
+
+import pytest
+
+@pytest.fixture
+def shell(target, monkeypatch):
+    # micromon.py is shadowed by the micromon package
+    spec = importlib.util.spec_from_file_location(
+        'shell', os.path.join(os.path.dirname(__file__), '..', 'micromon.py'))
+    shell = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(shell)
+    monkeypatch.setattr(shell, 'Target', lambda: target)
+    monkeypatch.setattr(shell, 'Loader', lambda target: None)
+    return shell.CommandParser(cache=True)
+
+def test_script_batches_read_from_the_cache(shell, emulator, capsys):
+    emulator.memory.write(0x200, b'\x44\x33\x22\x11')
+    script = ('readl 0x200\n' * 8 + 'writel 0x100 0x12345678\n'
+              'readl 0x100\nreadl 0x200\n')
+    assert shell.run_script(io.StringIO(script)) == 0
+    stats = shell.core.cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 8
+    values = [line.split()[0] for line in capsys.readouterr().out.split('\n')
+              if line.strip()]
+    assert values == ['0x11223344'] * 8 + ['0x12345678', '0x11223344']
+    assert emulator.memory.read(0x100, 4) == b'\x78\x56\x34\x12'
+
+def test_batch_drops_only_the_pages_it_writes(shell):
+    shell.preloop()
+    core = shell.core
+    core.read_u32(0x000)
+    core.read_u32(0x400)
+    with core.batch() as batch:
+        batch.write_u32(0x404, 1)
+        first = batch.read_u32(0x000)
+        second = batch.read_u32(0x404)
+    assert (first.result(), second.result()) == (0, 1)
+    assert core.cache_stats()['hits'] == 1
+    assert core.cache_stats()['invalidations'] == 1
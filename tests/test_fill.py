@@ -0,0 +1,55 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import os
+from time import perf_counter
+
+from micromon.core import _fill_min_run, _fill_runs
+from micromon.target import u32
+
+def test_fill_runs_finds_unaligned_runs():
+    data = b'ab' + bytes(2000) + b'c' + b'\x12\x34' * 600 + os.urandom(100)
+    assert _fill_runs(memoryview(data)) == [
+        (2, 2000, 0, 8),
+        (2003, 1200, 0x34123412, 16),
+    ]
+
+def test_fill_runs_skips_short_runs():
+    data = (bytes(_fill_min_run - 4) + b'\x01\x02\x03\x04') * 64
+    assert _fill_runs(memoryview(data)) == []
+
+def test_fill_runs_runs_repeat_their_pattern():
+    data = os.urandom(999) + bytes(5000) + os.urandom(7) + b'wxyz' * 700
+    for offset, size, pattern, width in _fill_runs(memoryview(data)):
+        assert size >= _fill_min_run
+        assert data[offset:offset+size] == \
+            (u32.pack(pattern) * (size // 4 + 1))[:size]
+
+def test_fill_runs_is_linear():
+    # runs just under the threshold made the old regex backtrack
+    data = (bytes(_fill_min_run - 4) + b'\x01\x02\x03\x04') * 4096
+    start = perf_counter()
+    _fill_runs(memoryview(data))
+    assert perf_counter() - start < 2.0
+
+def test_mem_write_sends_runs_as_fill(core, emulator):
+    data = os.urandom(3000) + bytes(100000) + os.urandom(5) + b'\xa5' * 9999
+    assert core.mem_write(0x10001, data, compress=False)
+    assert bytes(emulator.memory.read(0x10001, len(data))) == data
+    commands = core.stats()['commands']
+    assert commands['mem_fill']['calls'] == 2
+    assert commands['mem_write']['bytes_out'] < 4000
@@ -0,0 +1,91 @@
+#
+#  Copyright (C) 2011-2020 Jeff Kent <jeff@jkent.net>
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License version 2 as
+#  published by the Free Software Foundation.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+
+import mmap
+import os
+import struct
+
+import pytest
+
+from micromon.config import Config
+from micromon.elf import ElfImage
+from micromon.target import Target
+
+def build_elf(path, entry, segments):
+    """an ARM executable with one PT_LOAD per (vaddr, paddr, data, memsz)"""
+    phoff = 52
+    offset = phoff + 32 * len(segments)
+    headers = b''
+    body = b''
+    for vaddr, paddr, data, memsz in segments:
+        headers += struct.pack('<8L', 1, offset + len(body), vaddr, paddr,
+                               len(data), memsz, 7, 4)
+        body += data
+    path.write_bytes(struct.pack('<16sHHLLLLLHHHHHH',
+                                 b'\x7fELF\x01\x01\x01' + bytes(9), 2, 40, 1,
+                                 entry, phoff, 0, 0, 52, 32, len(segments),
+                                 40, 0, 0) + headers + body)
+    return str(path)
+
+def test_mem_write_sends_views_of_the_block_size(core, target, emulator,
+                                                 tmp_path, monkeypatch):
+    path = tmp_path / 'data'
+    path.write_bytes(os.urandom(1000))
+    sent = []
+    write = target.write
+    def record(data):
+        sent.append((type(data), len(data)))
+        write(data)
+    monkeypatch.setattr(target, 'write', record)
+    target.set_block_size(300)
+    with open(path, 'rb') as fp, \
+            mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert core.mem_write(0x10000, m, compress=False)
+    assert [n for t, n in sent if t is memoryview] == [300, 300, 300, 100]
+    assert emulator.memory.read(0x10000, 1000) == path.read_bytes()
+
+def test_invalid_block_size_is_rejected(emulator):
+    block_size = Config.get('target.block_size')
+    Config.set('target.block_size', '0')
+    try:
+        with pytest.raises(ValueError):
+            Target(emulator.open_pty())
+    finally:
+        Config.set('target.block_size', block_size)
+
+def test_elf_segments_load_at_their_physical_address(core, emulator,
+                                                      tmp_path):
+    text = os.urandom(3000)
+    data = os.urandom(100)
+    filename = build_elf(tmp_path / 'image.elf', 0xC0008010, [
+        (0xC0008000, 0x8000, text, 3000 + 5000),
+        (0x40000, 0x40000, data, 100),
+    ])
+    core.mem_fill(0x8000, 8000, 0xFF)
+    with ElfImage(filename) as image:
+        assert image.entry == 0x8010
+        assert image.load(core)
+        assert emulator.memory.read(0x8000, 8000) == text + bytes(5000)
+        assert emulator.memory.read(0x40000, 100) == data
+        core.write_u8(0x40010, data[0x10] ^ 0xFF)
+        assert not image.verify(core)
+
+def test_elf_entry_outside_the_segments_is_rejected(tmp_path):
+    filename = build_elf(tmp_path / 'image.elf', 0x1234,
+                         [(0x8000, 0x8000, bytes(16), 16)])
+    with pytest.raises(Exception, match='entry point'):
+        ElfImage(filename)